@@ -3,11 +3,13 @@ import os
 from datetime import datetime
 from shutil import copyfile
 import cv2
+import numpy as np
 
 from models.frame import Frame
 from flask import Blueprint, jsonify, render_template, request
 
 from service.rtdetr_manager_service import get_processor
+from service.inference_cache_service import inference_cache, filter_by_confidence, MIN_CONFIDENCE
 
 annotate_bp = Blueprint('annotate_bp', __name__)
 
@@ -142,10 +144,29 @@ def auto_annotate_frame():
     if not os.path.exists(full_path):
         return jsonify({"error": "Image file not found"}), 404
 
-    frame_data = cv2.imread(full_path)
-    if frame_data is None:
+    with open(full_path, 'rb') as f:
+        encoded = f.read()
+
+    def infer():
+        frame_data = cv2.imdecode(np.frombuffer(encoded, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame_data is None:
+            return None, False
+        # Cache everything above the floor; the slider value is applied below
+        detections, failed_models = get_processor().process_frame(frame_data, MIN_CONFIDENCE)
+        return detections, bool(failed_models)
+
+    try:
+        detections, partial = inference_cache.get_or_compute(encoded, infer)
+    except Exception as e:
+        return jsonify({"error": f"Auto annotation failed: {e}"}), 500
+    if detections is None:
         return jsonify({"error": "Unable to load the image"}), 404
 
-    detections = get_processor().process_frame(frame_data, confidence)
-    return jsonify({"frame_id": frame_id, "detections": detections})
+    return jsonify({"frame_id": frame_id, "detections": filter_by_confidence(detections, confidence),
+                    "partial": partial})
+
+
+@annotate_bp.route('/api/auto_annotate/cache')
+def auto_annotate_cache_stats():
+    return jsonify(inference_cache.stats())
 
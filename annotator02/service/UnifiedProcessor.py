@@ -1,8 +1,10 @@
+import logging
 import threading
 
 from service.animal_image_procesor import AnimalDetectionProcessor
 from service.human_processor_service import RTDETRProcessor
 
+logger = logging.getLogger(__name__)
 
 class UnifiedProcessor:
     def __init__(self):
@@ -12,20 +14,30 @@ class UnifiedProcessor:
         self.lock = threading.Lock()
 
     def process_frame(self, frame,confidecnce):
-        """Process the frame using both models in parallel and return combined detections"""
+        """Process the frame using both models in parallel.
+
+        Returns (combined detections, names of the models that failed). A
+        failed model only drops its own detections; if both fail, the first
+        error is raised.
+        """
         combined_detections = []
+        errors = {}
 
         def append_detections(results):
             with self.lock:
                 combined_detections.extend(results)
 
         def run_animal():
-            results = self.animal_processor.process_frame(frame,confidecnce)
-            append_detections(results)
+            try:
+                append_detections(self.animal_processor.process_frame(frame,confidecnce))
+            except Exception as e:
+                errors["animal"] = e
 
         def run_rtdetr():
-            results = self.rtdetr_processor.get_detections(frame,confidecnce)
-            append_detections(results)
+            try:
+                append_detections(self.rtdetr_processor.get_detections(frame,confidecnce))
+            except Exception as e:
+                errors["human"] = e
 
         t1 = threading.Thread(target=run_animal)
         t2 = threading.Thread(target=run_rtdetr)
@@ -35,4 +47,8 @@ class UnifiedProcessor:
         t1.join()
         t2.join()
 
-        return combined_detections
+        if len(errors) == 2:
+            raise next(iter(errors.values()))
+        for name, error in errors.items():
+            logger.warning(f"{name} model failed, returning partial detections: {error}")
+        return combined_detections, sorted(errors)
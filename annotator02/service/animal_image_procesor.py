@@ -35,19 +35,20 @@ class AnimalDetectionProcessor:
             self.processor = None
 
     def process_frame(self, frame, confidence_threshold=None):
+        """Animal detections of a BGR frame; raises on failure so no result is mistaken for "nothing found"."""
         if self.model is None or self.processor is None:
             logger.error("❌ Model or processor is not loaded.")
-            return []
+            raise RuntimeError("Animal detection model is not loaded")
 
         if frame is None or not isinstance(frame, np.ndarray):
             logger.error("❌ Invalid frame passed to process_frame.")
-            return []
+            raise ValueError("Invalid frame passed to process_frame")
 
         try:
             rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
         except Exception as e:
             logger.error(f"❌ Failed to convert frame to RGB: {e}")
-            return []
+            raise
 
         try:
             inputs = self.processor(images=rgb, return_tensors="pt")
@@ -82,6 +83,7 @@ class AnimalDetectionProcessor:
                 detections.append({
                     "class": class_name,
                     "confidence": round(score.item(), 2),
+                    "score": score.item(),  # unrounded, for threshold filtering
                     "xmin": xmin,
                     "ymin": ymin,
                     "xmax": xmax,
@@ -92,4 +94,4 @@ class AnimalDetectionProcessor:
 
         except Exception as e:
             logger.error(f"❌ Error during inference: {e}")
-            return []
+            raise
@@ -55,6 +55,7 @@ class RTDETRProcessor:
             detections.append({
                 "class": class_name,
                 "confidence": round(score.item(), 2),
+                "score": score.item(),  # unrounded, for threshold filtering
                 "xmin": xmin,
                 "ymin": ymin,
                 "xmax": xmax,
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import logging
+import os
+import shutil
+import threading
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATUS_PATH = "modelRepository/modelUsageStatus.json"
+CACHE_SIZE = int(os.environ.get("VIGILNET_ANNOTATE_CACHE_SIZE", "256"))  # frames kept in memory
+CACHE_DIR = os.environ.get("VIGILNET_ANNOTATE_CACHE_DIR", "")  # empty keeps the cache in memory only
+# Detections are cached down to this score, so any slider value above it is served without inference
+MIN_CONFIDENCE = float(os.environ.get("VIGILNET_ANNOTATE_MIN_CONFIDENCE", "0.05"))
+CACHE_FORMAT = 2  # bumped when the cached detection fields change, so older disk entries are dropped
+
+
+def content_hash(data):
+    return hashlib.sha1(data).hexdigest()
+
+
+def filter_by_confidence(detections, confidence):
+    # Same test as the HF post-processing threshold: strictly above, on the unrounded score
+    return [det for det in detections if det["score"] > confidence]
+
+
+class InferenceCache:
+    """LRU cache of raw auto-annotation detections keyed by frame content hash and model version.
+
+    The model version is a hash of modelUsageStatus.json; it is re-checked on
+    every lookup (a stat call, the file is only re-read when its mtime or size
+    changes), and a new version drops the memory cache and the old on-disk
+    entries. With `cache_dir` set, entries are also written there as JSON and
+    survive restarts.
+    """
+
+    def __init__(self, max_size=CACHE_SIZE, cache_dir=CACHE_DIR, status_path=MODEL_STATUS_PATH):
+        self.max_size = max_size
+        self.cache_dir = cache_dir
+        self.status_path = status_path
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self._status_stamp = None
+        self._version = None
+
+    def model_version(self):
+        try:
+            stat = os.stat(self.status_path)
+            stamp = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stamp = None
+        with self.lock:
+            if stamp == self._status_stamp and self._version is not None:
+                return self._version
+        try:
+            with open(self.status_path, "rb") as f:
+                version = f"v{CACHE_FORMAT}-{content_hash(f.read())[:16]}"
+        except OSError:
+            version = f"v{CACHE_FORMAT}-no-status"
+
+        with self.lock:
+            self._status_stamp = stamp
+            if version != self._version:
+                if self._version is not None:
+                    logger.info(f"Model status changed ({self._version} -> {version}), clearing inference cache")
+                self.entries.clear()
+                self._version = version
+                self._prune_disk(version)
+            return version
+
+    def _disk_path(self, version, key):
+        return os.path.join(self.cache_dir, version, f"{key}.json")
+
+    def _prune_disk(self, version):
+        if not self.cache_dir or not os.path.isdir(self.cache_dir):
+            return
+        for name in os.listdir(self.cache_dir):
+            if name != version:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
+
+    def get(self, key):
+        version = self.model_version()
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+                self.hits += 1
+                return self.entries[key]
+
+        if self.cache_dir:
+            try:
+                with open(self._disk_path(version, key), "r") as f:
+                    detections = json.load(f)
+            except (OSError, ValueError):
+                detections = None
+            if detections is not None:
+                self._remember(key, detections)
+                with self.lock:
+                    self.hits += 1
+                return detections
+
+        with self.lock:
+            self.misses += 1
+        return None
+
+    def put(self, key, detections):
+        version = self.model_version()
+        self._remember(key, detections)
+        if self.cache_dir:
+            path = self._disk_path(version, key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, "w") as f:
+                    json.dump(detections, f)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                logger.warning(f"Could not write inference cache entry {path}: {e}")
+
+    def _remember(self, key, detections):
+        with self.lock:
+            self.entries[key] = detections
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def get_or_compute(self, data, infer):
+        """(raw detections, partial) for encoded image bytes; `infer()` runs only on a miss.
+
+        `infer()` returns (detections, partial). Only complete results are
+        cached: a partial or None result, or an exception raised by `infer()`,
+        is recomputed on the next request.
+        """
+        key = content_hash(data)
+        detections = self.get(key)
+        if detections is not None:
+            return detections, False
+        detections, partial = infer()
+        if detections is not None and not partial:
+            self.put(key, detections)
+        return detections, partial
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self.entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+                "model_version": self._version,
+                "disk_dir": self.cache_dir or None
+            }
+
+
+inference_cache = InferenceCache()
@@ -1,18 +1,31 @@
+import threading
 import torch
 import cv2
 from PIL import Image
 from transformers import AutoImageProcessor, AutoModelForDepthEstimation
+from service.model_warmup_service import compile_model, warm_up
+from service.preprocessing_service import build_preprocessor
 
 class DepthEstimator:
     def __init__(self, model_name="modelRepository/depth-model/default", device=None):
         self.device = device or ("cuda" if torch.cuda.is_available() else "cpu")
         self.processor = AutoImageProcessor.from_pretrained(model_name)
-        self.model = AutoModelForDepthEstimation.from_pretrained(model_name).to(self.device)
+        self.preprocessor = build_preprocessor(self.processor)
+        self.model = AutoModelForDepthEstimation.from_pretrained(model_name).to(self.device).eval()
+        self.model = compile_model(self.model, ("predicted_depth",), name=model_name)
+        self.ready = threading.Event()  # frames are not processed until the model has been warmed up
+
+    def warm_up(self):
+        warm_up("depth", lambda frames: [self.process_frame(frame) for frame in frames])
+        self.ready.set()
 
     def process_frame(self, frame):
-        # Convert BGR to RGB and to PIL
-        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-        inputs = self.processor(images=image, return_tensors="pt")
+        if self.preprocessor is not None:
+            inputs = self.preprocessor([frame])  # Reads the BGR frame directly
+        else:
+            # Convert BGR to RGB and to PIL
+            image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+            inputs = self.processor(images=image, return_tensors="pt")
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
         with torch.no_grad():
@@ -20,7 +33,7 @@ class DepthEstimator:
 
         depth = self.processor.post_process_depth_estimation(
             outputs,
-            target_sizes=[(image.height, image.width)],
+            target_sizes=[frame.shape[:2]],
         )[0]["predicted_depth"]
 
         depth = (depth - depth.min()) / (depth.max() - depth.min())
@@ -1,65 +1,70 @@
+import os
+import time
 import cv2
 import numpy as np
 
-def detect_motion(frame):
-    """Detects significant motion while ignoring lighting changes and wind-based movements."""
-    # Initialize background subtractor
-    fgbg = cv2.createBackgroundSubtractorMOG2(history=500, varThreshold=30, detectShadows=True) # change to 30 instead of 25
-    MOTION_THRESHOLD = 27  # Ignore small movements
-    NOISE_FILTER_RATIO = 0.15  # Ignore minor environmental noise
-    FRAME_SKIP = 5  # Process every 5th frame for efficiency
+MOTION_GATE_ENABLED = os.environ.get("VIGILNET_MOTION_GATE", "1") == "1"
+REFRESH_INTERVAL = float(os.environ.get("VIGILNET_MOTION_REFRESH_S", "10"))  # re-run the detector at least this often
+GATE_WIDTH = 320  # motion is judged on a downscaled grey frame
+MIN_MOTION_RATIO = 0.002  # fraction of foreground pixels that counts as motion
+LEARNING_FRAMES = 10  # frames that always pass while the background model settles
 
-    global prev_frame
 
-    if frame is None:
-        return False  # Ensure frame is valid
+class MotionGate:
+    """Per-camera motion detector deciding whether a frame needs a detector pass.
 
-    motion_detected = False
+    Keeps one MOG2 background model per camera across frames. Shadows and
+    speckle noise are removed before measuring the foreground ratio. Static
+    frames are skipped unless the last inference is older than `refresh_interval`.
+    """
 
-    try:
-        # Preprocess frame
-        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-        blurred = cv2.GaussianBlur(gray, (5, 5), 0)
-
-        # Apply background subtraction
-        fgmask = fgbg.apply(blurred)
-
-        # Morphological filtering to reduce noise
-        kernel = np.ones((3, 3), np.uint8)
-        fgmask = cv2.morphologyEx(fgmask, cv2.MORPH_OPEN, kernel)
+    def __init__(self, refresh_interval=REFRESH_INTERVAL, width=GATE_WIDTH, min_motion_ratio=MIN_MOTION_RATIO,
+                 history=500, var_threshold=30):
+        self.refresh_interval = refresh_interval
+        self.width = width
+        self.min_motion_ratio = min_motion_ratio
+        self.subtractor = cv2.createBackgroundSubtractorMOG2(history=history, varThreshold=var_threshold,
+                                                             detectShadows=True)
+        self.kernel = np.ones((3, 3), np.uint8)
+        self.frames = 0
+        self.inferences = 0
+        self.skipped = 0
+        self.motion_ratio = 0.0
+        self.last_inference = 0.0
 
-        # Edge detection
-        edges = cv2.Canny(gray, 50, 150)
-        fgmask = cv2.bitwise_and(fgmask, edges)
-
-        # Contour detection
-        contours, _ = cv2.findContours(fgmask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        filtered_contours = [cnt for cnt in contours if cv2.contourArea(cnt) > MOTION_THRESHOLD]
+    def has_motion(self, frame):
+        height, width = frame.shape[:2]
+        if width > self.width:
+            frame = cv2.resize(frame, (self.width, max(1, height * self.width // width)), interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+        gray = cv2.GaussianBlur(gray, (5, 5), 0)
 
-        # Optical Flow Filtering - Only if we have contours and a previous frame
-        if filtered_contours and prev_frame is not None:
-            try:
-                prev_gray = cv2.cvtColor(prev_frame, cv2.COLOR_BGR2GRAY)
-                # Ensure both frames have the same dimensions
-                if prev_gray.shape == gray.shape:
-                    flow = cv2.calcOpticalFlowFarneback(
-                        prev_gray, gray, None, 
-                        0.5, 3, 15, 3, 5, 1.2, 0
-                    )
-                    mag, _ = cv2.cartToPolar(flow[..., 0], flow[..., 1])
-                    movement_magnitude = np.mean(mag)
+        mask = self.subtractor.apply(gray)
+        _, mask = cv2.threshold(mask, 200, 255, cv2.THRESH_BINARY)  # Shadows are marked 127
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, self.kernel)
 
-                    if movement_magnitude > NOISE_FILTER_RATIO * 2:
-                        motion_detected = True
-            except Exception as flow_error:
-                print(f"Optical flow error: {flow_error}")
-                motion_detected = False
+        self.frames += 1
+        self.motion_ratio = cv2.countNonZero(mask) / mask.size
+        return self.frames <= LEARNING_FRAMES or self.motion_ratio >= self.min_motion_ratio
 
-        # Update previous frame
-        prev_frame = frame.copy()
+    def should_infer(self, frame):
+        """True if the frame has motion or the cached result is due for a refresh."""
+        if self.has_motion(frame) or time.time() - self.last_inference >= self.refresh_interval:
+            return True
+        self.skipped += 1
+        return False
 
-    except Exception as e:
-        print(f"Error in motion detection: {e}")
-        motion_detected = False
+    def mark_inferred(self):
+        self.inferences += 1
+        self.last_inference = time.time()
 
-    return motion_detected
\ No newline at end of file
+    def stats(self):
+        gated = self.inferences + self.skipped
+        return {
+            "frames": self.frames,
+            "inferences": self.inferences,
+            "skipped": self.skipped,
+            "skip_ratio": round(self.skipped / gated, 3) if gated else 0.0,
+            "motion_ratio": round(self.motion_ratio, 4),
+            "refresh_interval": self.refresh_interval
+        }
@@ -0,0 +1,76 @@
+import cv2
+import numpy as np
+
+
+def parse_polygons(polygons):
+    """Validate ROI polygons: a list of polygons, each at least 3 [x, y] points normalised to 0..1."""
+    if polygons is None:
+        return None
+    if not isinstance(polygons, list):
+        raise ValueError("roi_polygons must be a list of polygons")
+    parsed = []
+    for polygon in polygons:
+        if not isinstance(polygon, list) or len(polygon) < 3:
+            raise ValueError("Each ROI polygon needs at least 3 [x, y] points")
+        points = []
+        for point in polygon:
+            try:
+                x, y = (float(v) for v in point)
+            except (TypeError, ValueError):
+                raise ValueError("ROI points must be [x, y] pairs of numbers")
+            if not (0.0 <= x <= 1.0 and 0.0 <= y <= 1.0):
+                raise ValueError("ROI points must be normalised to the 0..1 range")
+            points.append([x, y])
+        parsed.append(points)
+    return parsed or None
+
+
+class RegionOfInterest:
+    """Polygon zones of one camera, used to crop and mask frames before inference.
+
+    Polygons are stored normalised, so they survive stream or inference size
+    changes; the pixel mask and bounding rectangle are cached per frame size.
+    """
+
+    def __init__(self, polygons):
+        self.polygons = [np.asarray(polygon, dtype=np.float32) for polygon in polygons]
+        self._shape = None
+        self._rect = None
+        self._mask = None
+
+    def _prepare_for(self, height, width):
+        if self._shape == (height, width):
+            return
+        scale = np.array([width - 1, height - 1], dtype=np.float32)
+        pixel_polygons = [np.round(polygon * scale).astype(np.int32) for polygon in self.polygons]
+        points = np.concatenate(pixel_polygons)
+        x0, y0 = points.min(axis=0)
+        x1, y1 = points.max(axis=0) + 1
+
+        mask = np.zeros((y1 - y0, x1 - x0), dtype=np.uint8)
+        cv2.fillPoly(mask, [polygon - [x0, y0] for polygon in pixel_polygons], 255)
+        self._shape = (height, width)
+        self._rect = (int(x0), int(y0), int(x1), int(y1))
+        self._mask = mask
+
+    def crop(self, frame):
+        """Masked crop of the ROI bounding rectangle and its (x, y) offset in the frame."""
+        self._prepare_for(*frame.shape[:2])
+        x0, y0, x1, y1 = self._rect
+        region = frame[y0:y1, x0:x1]
+        return cv2.bitwise_and(region, region, mask=self._mask), (x0, y0)
+
+    def map_back(self, detections, offset):
+        """Shift crop-space detections to frame coordinates, keeping those centred inside a polygon."""
+        if not len(detections):
+            return detections
+        centre_x = ((detections["xmin"] + detections["xmax"]) // 2).clip(0, self._mask.shape[1] - 1)
+        centre_y = ((detections["ymin"] + detections["ymax"]) // 2).clip(0, self._mask.shape[0] - 1)
+        detections = detections[self._mask[centre_y, centre_x] > 0].copy()
+
+        x0, y0 = offset
+        detections["xmin"] += x0
+        detections["xmax"] += x0
+        detections["ymin"] += y0
+        detections["ymax"] += y0
+        return detections
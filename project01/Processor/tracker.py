@@ -0,0 +1,188 @@
+import itertools
+import os
+import numpy as np
+
+from service.detection_array_service import TRACK_DTYPE
+
+try:
+    from scipy.optimize import linear_sum_assignment
+except ImportError:
+    linear_sum_assignment = None  # Greedy matching is used instead
+
+DETECT_EVERY_N = int(os.environ.get("VIGILNET_DETECT_EVERY", "1"))  # detector passes every N frames
+TRACK_MIN_HITS = int(os.environ.get("VIGILNET_TRACK_MIN_HITS", "3"))  # matched passes before a track is born
+TRACK_MAX_AGE = int(os.environ.get("VIGILNET_TRACK_MAX_AGE", "5"))  # missed passes before a track dies
+TRACK_IOU_THRESHOLD = 0.3
+
+
+def _box_to_state(box):
+    """(x0, y0, x1, y1) -> (centre x, centre y, area, aspect ratio)."""
+    width, height = box[2] - box[0], box[3] - box[1]
+    return np.array([box[0] + width / 2, box[1] + height / 2, width * height, width / max(height, 1e-6)])
+
+
+def _state_to_box(state):
+    area, ratio = max(state[2], 1e-6), max(state[3], 1e-6)
+    width = np.sqrt(area * ratio)
+    height = area / max(width, 1e-6)
+    return np.array([state[0] - width / 2, state[1] - height / 2, state[0] + width / 2, state[1] + height / 2])
+
+
+def iou_matrix(boxes_a, boxes_b):
+    x0 = np.maximum(boxes_a[:, None, 0], boxes_b[None, :, 0])
+    y0 = np.maximum(boxes_a[:, None, 1], boxes_b[None, :, 1])
+    x1 = np.minimum(boxes_a[:, None, 2], boxes_b[None, :, 2])
+    y1 = np.minimum(boxes_a[:, None, 3], boxes_b[None, :, 3])
+    inter = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    area_a = (boxes_a[:, 2] - boxes_a[:, 0]) * (boxes_a[:, 3] - boxes_a[:, 1])
+    area_b = (boxes_b[:, 2] - boxes_b[:, 0]) * (boxes_b[:, 3] - boxes_b[:, 1])
+    union = area_a[:, None] + area_b[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+
+class KalmanBoxTrack:
+    """Constant-velocity Kalman filter over (cx, cy, area, aspect) of one tracked box, as in SORT."""
+
+    F = np.eye(7)
+    F[0, 4] = F[1, 5] = F[2, 6] = 1.0
+    H = np.eye(4, 7)
+    Q = np.diag([1.0, 1.0, 1.0, 1.0, 0.01, 0.01, 0.0001])
+    R = np.diag([1.0, 1.0, 10.0, 10.0])
+
+    def __init__(self, track_id, box, class_name, confidence):
+        self.track_id = track_id
+        self.class_name = class_name
+        self.confidence = confidence
+        self.x = np.zeros(7)
+        self.x[:4] = _box_to_state(box)
+        self.P = np.diag([10.0, 10.0, 10.0, 10.0, 1e4, 1e4, 1e4])
+        self.hits = 1
+        self.misses = 0
+        self.confirmed = False
+
+    def predict(self):
+        if self.x[2] + self.x[6] <= 0:
+            self.x[6] = 0.0  # Keep the area positive
+        self.x = self.F @ self.x
+        self.P = self.F @ self.P @ self.F.T + self.Q
+        return self.box()
+
+    def update(self, box, confidence):
+        y = _box_to_state(box) - self.H @ self.x
+        S = self.H @ self.P @ self.H.T + self.R
+        K = self.P @ self.H.T @ np.linalg.inv(S)
+        self.x = self.x + K @ y
+        self.P = (np.eye(7) - K @ self.H) @ self.P
+        self.confidence = confidence
+        self.hits += 1
+        self.misses = 0
+
+    def box(self):
+        return _state_to_box(self.x)
+
+
+class SortTracker:
+    """Per-camera SORT-style tracker giving detections persistent ids.
+
+    `update()` is called with detector output; `propagate()` advances every
+    track with its motion model on frames where the detector is skipped. A
+    track is *born* once matched on `min_hits` detector passes and *dies* after
+    `max_age` passes without a match; both are reported so logging and
+    recording can react to tracks instead of per-frame streaks.
+    """
+
+    def __init__(self, min_hits=TRACK_MIN_HITS, max_age=TRACK_MAX_AGE, iou_threshold=TRACK_IOU_THRESHOLD):
+        self.min_hits = min_hits
+        self.max_age = max_age
+        self.iou_threshold = iou_threshold
+        self.tracks = []
+        self.frames_since_update = 0
+        self._ids = itertools.count(1)
+
+    def _match(self, predicted, detections):
+        if not len(self.tracks) or not len(detections):
+            return []
+        boxes = np.stack([detections["xmin"], detections["ymin"], detections["xmax"], detections["ymax"]],
+                         axis=1).astype(np.float64)
+        iou = iou_matrix(predicted, boxes)
+        track_classes = np.array([track.class_name for track in self.tracks])
+        iou[track_classes[:, None] != detections["class"][None, :]] = 0.0
+
+        if linear_sum_assignment is not None:
+            rows, cols = linear_sum_assignment(-iou)
+            pairs = zip(rows, cols)
+        else:
+            pairs = []
+            taken_rows, taken_cols = set(), set()
+            for flat in np.argsort(-iou, axis=None):
+                row, col = divmod(int(flat), iou.shape[1])
+                if row not in taken_rows and col not in taken_cols:
+                    taken_rows.add(row)
+                    taken_cols.add(col)
+                    pairs.append((row, col))
+        return [(int(row), int(col)) for row, col in pairs if iou[row, col] >= self.iou_threshold]
+
+    def update(self, detections):
+        """Associate detector output with the tracks; returns (confirmed tracks, births, deaths)."""
+        self.frames_since_update = 0
+        predicted = np.array([track.predict() for track in self.tracks]).reshape(-1, 4)
+        matches = self._match(predicted, detections)
+        matched_tracks = {row for row, _ in matches}
+        matched_detections = {col for _, col in matches}
+
+        births = []
+        updated = []
+        for row, col in matches:
+            track = self.tracks[row]
+            det = detections[col]
+            track.update(np.array([det["xmin"], det["ymin"], det["xmax"], det["ymax"]], dtype=np.float64),
+                         float(det["confidence"]))
+            if not track.confirmed and track.hits >= self.min_hits:
+                track.confirmed = True
+                births.append(track)
+            updated.append(track)
+
+        deaths = []
+        survivors = []
+        for index, track in enumerate(self.tracks):
+            if index not in matched_tracks:
+                track.misses += 1
+            if track.misses > self.max_age:
+                if track.confirmed:
+                    deaths.append(track)
+                continue
+            survivors.append(track)
+
+        for col in range(len(detections)):
+            if col in matched_detections:
+                continue
+            det = detections[col]
+            track = KalmanBoxTrack(next(self._ids),
+                                   np.array([det["xmin"], det["ymin"], det["xmax"], det["ymax"]], dtype=np.float64),
+                                   str(det["class"]), float(det["confidence"]))
+            if self.min_hits <= 1:
+                track.confirmed = True
+                births.append(track)
+            survivors.append(track)
+            updated.append(track)
+
+        self.tracks = survivors
+        return self._as_array([track for track in updated if track.confirmed]), births, deaths
+
+    def propagate(self):
+        """Advance confirmed tracks without a detector pass; returns them at their predicted positions."""
+        self.frames_since_update += 1
+        for track in self.tracks:
+            track.predict()
+        return self._as_array([track for track in self.tracks if track.confirmed and not track.misses])
+
+    def active_count(self):
+        return sum(1 for track in self.tracks if track.confirmed)
+
+    @staticmethod
+    def _as_array(tracks):
+        result = np.empty(len(tracks), dtype=TRACK_DTYPE)
+        for index, track in enumerate(tracks):
+            x0, y0, x1, y1 = track.box()
+            result[index] = (track.class_name, track.confidence, int(x0), int(y0), int(x1), int(y1), track.track_id)
+        return result
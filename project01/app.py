@@ -5,9 +5,12 @@ from flask import Flask, Response, abort, redirect, request, flash, send_file, s
 from models import db, init_db
 from controllers import auth_controller, operator_controller, admin_controller, nvr_controller, camera_controller, \
     log_controller, recording_controller, manual_recording_controller
-from service.video_processor_service import start_processing
+from service.video_processor_service import start_processing, register_camera_frame_shapes
 import multiprocessing
 from service.rtdetr_manager_service import get_processors
+from service.camera_worker_pool_service import configured_worker_count
+from service.rtdetr_manager_service import concurrent_inferences
+from service.thread_budget_service import apply_thread_budget
 from flask_socketio import SocketIO
 from service.socket_events_service import register_socket_handlers
 from service.log_notifier_service import init_notifier, emit_from_queue
@@ -73,11 +76,16 @@ def initialize_directories_and_files():
 if __name__ == "__main__":
     init_notifier(socketio)
     initialize_directories_and_files()
-    processor = get_processors()
     register_socket_handlers(socketio)
 
     with app.app_context():
         db.create_all()
+        if not configured_worker_count():
+            # Worker processes load their own models; the web process only needs them in thread mode
+            apply_thread_budget(1, concurrent_inferences())
+            register_camera_frame_shapes()
+            # Loaded in the background: the web UI is up immediately and each mode starts once its models are ready
+            threading.Thread(target=get_processors, daemon=True).start()
         threading.Thread(target=emit_from_queue, args=(log_emit_queue,), daemon=True).start()
         threading.Thread(target=start_processing, args=(app,), daemon=True).start()
 
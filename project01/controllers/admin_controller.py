@@ -2,9 +2,12 @@ from threading import Thread
 
 from service.user_service import UserService
 from flask import Blueprint, render_template, request, jsonify, redirect, url_for, current_app
-from service.video_processor_service import model_changed, get_selected_model_from_service, change_frame_enhancer
+from service.video_processor_service import model_changed, get_selected_model_from_service, change_frame_enhancer, \
+    PIPELINE_MODES
 
-from service.rtdetr_manager_service import get_processors
+from service.video_processor_service import reload_processors, get_inference_batch_stats, get_model_warmup_reports, \
+    get_thread_layouts, get_stage_latency, get_model_readiness, get_model_swap_reports
+from service.rtdetr_manager_service import get_model_pool_stats
 
 from service.log_notifier_service import emit_recording_event
 
@@ -32,6 +35,8 @@ def create_user():
 
 @admin_bp.route('/admin/changeAiModel/<string:model_name>', methods=['GET'])
 def change_ai_model(model_name):
+    if model_name not in PIPELINE_MODES:
+        return jsonify({"error": f"Unknown mode '{model_name}'", "modes": list(PIPELINE_MODES)}), 400
     model_changed(model_name)
     return jsonify({"message": "Model changed !!"}), 200
 
@@ -54,18 +59,48 @@ def get_frame_enhancer_status():
     selected_model=get_selected_model_from_service()
     return jsonify({"model_selected": selected_model}), 200
 
+@admin_bp.route('/admin/inference/batch_stats', methods=['GET'])
+def inference_batch_stats():
+    return jsonify(get_inference_batch_stats()), 200
+
+@admin_bp.route('/admin/inference/model_pool', methods=['GET'])
+def inference_model_pool():
+    return jsonify(get_model_pool_stats() or {}), 200
+
+@admin_bp.route('/admin/inference/warmup', methods=['GET'])
+def inference_warmup():
+    return jsonify(get_model_warmup_reports()), 200
+
+@admin_bp.route('/admin/inference/threads', methods=['GET'])
+def inference_threads():
+    return jsonify(get_thread_layouts()), 200
+
+@admin_bp.route('/admin/inference/readiness', methods=['GET'])
+def inference_readiness():
+    # Always answers immediately; "ready" says whether the selected mode's models can serve
+    return jsonify(get_model_readiness()), 200
+
+@admin_bp.route('/admin/inference/swaps', methods=['GET'])
+def inference_swaps():
+    return jsonify(get_model_swap_reports()), 200
+
+@admin_bp.route('/admin/inference/latency', methods=['GET'])
+def inference_latency():
+    camera_id = request.args.get('camera_id', type=int)
+    return jsonify(get_stage_latency(camera_id)), 200
+
 @admin_bp.route("/recreate-processors", methods=["POST"])
 def recreate_processors():
     try:
         emit_recording_event("PLease Wait....", "ModelChanging")
-        selected_model = get_selected_model_from_service()
-        if selected_model == 'human':
-            model_changed('none')
-        get_processors()       # ✅ Create processors with updated model path
-        if selected_model == 'human':
-            model_changed('human')
+        # The new models are loaded next to the running ones and swapped in; detection keeps running meanwhile
+        workers = reload_processors()
+        failed = {index: result["error"] for index, result in (workers or {}).items() if not result["ok"]}
+        if failed:
+            emit_recording_event(f"❌ Failed to reload processors on worker(s) {sorted(failed)}", "System")
+            return jsonify({"error": "Model reload failed on some workers", "workers": workers}), 500
         emit_recording_event("Model Changed Successfully ", "ModelChanged")
-        return jsonify({"message": "✅ Processors reloaded and detection restarted."}), 200
+        return jsonify({"message": "✅ Processors reloaded and detection restarted.", "workers": workers}), 200
     except Exception as e:
         emit_recording_event(f"❌ Failed to reload processors: {str(e)}", "System")
         return jsonify({"error": str(e)}), 500
@@ -1,15 +1,62 @@
+import json
 import threading
 import time
 import cv2
 from flask import Blueprint, render_template, request, jsonify,Response,current_app
 from models.manual_recording import ManualRecording
 from models.recording import Recording
-from service.video_processor_service import processed_frames, restart_processing, stop_processing
+from service.video_processor_service import restart_processing, stop_processing, get_capture_stats, get_reconnect_status
+from service.frame_bus_service import open_consumer_ring, close_consumer_ring
 from models import db
 from models.camera import Camera
+from Processor.roi import parse_polygons
 
 camera_bp = Blueprint('camera', __name__)
 
+INGEST_BACKENDS = ("opencv", "ffmpeg")
+DECODE_MODES = ("auto", "full", "keyframe")
+
+
+def parse_inference_size(data, width=None, height=None):
+    """Read inference_width/inference_height from a request body; both or neither must be set."""
+    width = data.get("inference_width", width)
+    height = data.get("inference_height", height)
+    if width in (None, "", 0) and height in (None, "", 0):
+        return None, None
+    try:
+        width, height = int(width), int(height)
+    except (TypeError, ValueError):
+        raise ValueError("inference_width and inference_height must both be integers")
+    if width <= 0 or height <= 0:
+        raise ValueError("inference_width and inference_height must be positive")
+    return width, height
+
+def check_tiling_resolution(tile_size, inference_width):
+    """Tiling recovers detail from native-resolution frames; on frames already downscaled it only adds work."""
+    if tile_size and inference_width:
+        raise ValueError("tile_size cannot be combined with an inference size: tiles need native-resolution frames")
+
+def parse_tiling(data, size=None, overlap=0.2):
+    """Read tile_size/tile_overlap from a request body; a missing or empty tile_size turns tiling off."""
+    size = data.get("tile_size", size)
+    overlap = data.get("tile_overlap", overlap)
+    if size in (None, "", 0):
+        size = None
+    else:
+        try:
+            size = int(size)
+        except (TypeError, ValueError):
+            raise ValueError("tile_size must be an integer")
+        if size < 64:
+            raise ValueError("tile_size must be at least 64 pixels")
+    try:
+        overlap = float(0.2 if overlap in (None, "") else overlap)
+    except (TypeError, ValueError):
+        raise ValueError("tile_overlap must be a number")
+    if not 0.0 <= overlap < 0.9:
+        raise ValueError("tile_overlap must be between 0 and 0.9")
+    return size, overlap
+
 @camera_bp.route('/admin/cameras', methods=['GET'])
 def camera():
     return render_template('/admin/cameras.html')
@@ -31,7 +78,14 @@ def get_cameras_by_nvr(nvr_id):
                 "url": cam.url,
                 "channel_url": cam.channel_url,
                 "description": cam.description,
-                "nvr_id": cam.nvr_id
+                "nvr_id": cam.nvr_id,
+                "ingest_backend": cam.ingest_backend,
+                "decode_mode": cam.decode_mode,
+                "inference_width": cam.inference_width,
+                "inference_height": cam.inference_height,
+                "roi_polygons": cam.roi(),
+                "tile_size": cam.tile_size,
+                "tile_overlap": cam.tile_overlap
             }
             for cam in cameras
         ]
@@ -58,7 +112,14 @@ def get_camera_by_id(id):
                 "url": cam.url,
                 "channel_url": cam.channel_url,
                 "description": cam.description,
-                "nvr_id": cam.nvr_id
+                "nvr_id": cam.nvr_id,
+                "ingest_backend": cam.ingest_backend,
+                "decode_mode": cam.decode_mode,
+                "inference_width": cam.inference_width,
+                "inference_height": cam.inference_height,
+                "roi_polygons": cam.roi(),
+                "tile_size": cam.tile_size,
+                "tile_overlap": cam.tile_overlap
             }
             for cam in cameras
         ]
@@ -84,7 +145,14 @@ def get_all_cameras():
                 "channel": cam.channel,
                 "url": cam.url,
                 "description": cam.description,
-                "nvr_id": cam.nvr_id
+                "nvr_id": cam.nvr_id,
+                "ingest_backend": cam.ingest_backend,
+                "decode_mode": cam.decode_mode,
+                "inference_width": cam.inference_width,
+                "inference_height": cam.inference_height,
+                "roi_polygons": cam.roi(),
+                "tile_size": cam.tile_size,
+                "tile_overlap": cam.tile_overlap
             }
             for cam in cameras
         ]
@@ -108,10 +176,22 @@ def add_camera():
         description = data.get("description")
         nvr_id = data.get("nvr_id")
         channel_url = data.get("channel_url")
+        ingest_backend = data.get("ingest_backend", "opencv")
+        decode_mode = data.get("decode_mode", "auto")
 
         # Validation
         if not all([channel, url, description, nvr_id, channel_url]):
             return jsonify({"error": "All fields are required!"}), 400
+        if ingest_backend not in INGEST_BACKENDS:
+            return jsonify({"error": f"ingest_backend must be one of {INGEST_BACKENDS}"}), 400
+        if decode_mode not in DECODE_MODES:
+            return jsonify({"error": f"decode_mode must be one of {DECODE_MODES}"}), 400
+        try:
+            inference_width, inference_height = parse_inference_size(data)
+            tile_size, tile_overlap = parse_tiling(data)
+            check_tiling_resolution(tile_size, inference_width)
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
 
 
         print("Checking started")
@@ -142,7 +222,13 @@ def add_camera():
             url=url,
             description=description,
             nvr_id=nvr_id,
-            channel_url=channel_url
+            channel_url=channel_url,
+            ingest_backend=ingest_backend,
+            decode_mode=decode_mode,
+            inference_width=inference_width,
+            inference_height=inference_height,
+            tile_size=tile_size,
+            tile_overlap=tile_overlap
         )
 
         db.session.add(new_camera)
@@ -150,7 +236,7 @@ def add_camera():
 
 
         print("Database insert complete")
-        restart_processing(new_camera.id, new_camera.url)
+        restart_processing(new_camera.id, new_camera.url, new_camera.processing_options())
 
 
         print("Request complete")
@@ -177,6 +263,19 @@ def update_camera(camera_id):
     new_channel_url = data.get('channel_url', camera.channel_url)
     new_description = data.get('description', camera.description)
     new_nvr_id = data.get('nvr_id', camera.nvr_id)
+    new_ingest_backend = data.get('ingest_backend', camera.ingest_backend)
+    if new_ingest_backend not in INGEST_BACKENDS:
+        return jsonify({'error': f'ingest_backend must be one of {INGEST_BACKENDS}'}), 400
+    new_decode_mode = data.get('decode_mode', camera.decode_mode)
+    if new_decode_mode not in DECODE_MODES:
+        return jsonify({'error': f'decode_mode must be one of {DECODE_MODES}'}), 400
+    try:
+        new_inference_width, new_inference_height = parse_inference_size(
+            data, camera.inference_width, camera.inference_height)
+        new_tile_size, new_tile_overlap = parse_tiling(data, camera.tile_size, camera.tile_overlap)
+        check_tiling_resolution(new_tile_size, new_inference_width)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
     # 🔍 Validate RTSP feed using OpenCV before updating
     cap = cv2.VideoCapture(new_url)
@@ -204,31 +303,117 @@ def update_camera(camera_id):
     camera.channel_url = new_channel_url
     camera.description = new_description
     camera.nvr_id = new_nvr_id
+    camera.ingest_backend = new_ingest_backend
+    camera.decode_mode = new_decode_mode
+    camera.inference_width = new_inference_width
+    camera.inference_height = new_inference_height
+    camera.tile_size = new_tile_size
+    camera.tile_overlap = new_tile_overlap
 
     try:
         db.session.commit()
-        restart_processing(camera.id, camera.url)
+        restart_processing(camera.id, camera.url, camera.processing_options())
         return jsonify({'message': 'Camera updated successfully'}), 200
     except Exception as e:
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
 
+@camera_bp.route('/admin/camera/<int:camera_id>/roi', methods=['GET'])
+def get_camera_roi(camera_id):
+    camera = Camera.query.get(camera_id)
+    if not camera:
+        return jsonify({'error': 'Camera not found'}), 404
+    return jsonify({'roi_polygons': camera.roi()}), 200
+
+
+@camera_bp.route('/admin/camera/<int:camera_id>/roi', methods=['PUT'])
+def update_camera_roi(camera_id):
+    """ Replace the camera's ROI polygons (normalised [x, y] points); null or [] clears them. """
+    camera = Camera.query.get(camera_id)
+    if not camera:
+        return jsonify({'error': 'Camera not found'}), 404
+
+    data = request.get_json() or {}
+    try:
+        polygons = parse_polygons(data.get('roi_polygons'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    camera.roi_polygons = json.dumps(polygons) if polygons else None
+    try:
+        db.session.commit()
+        restart_processing(camera.id, camera.url, camera.processing_options())
+        return jsonify({'message': 'Camera ROI updated successfully', 'roi_polygons': polygons}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@camera_bp.route('/admin/camera/capture_stats', methods=['GET'])
+def capture_stats():
+    """ Per-camera capture counters (grabbed / processed / dropped frames). """
+    return jsonify(get_capture_stats()), 200
+
+
+@camera_bp.route('/admin/camera/<int:camera_id>/capture_stats', methods=['GET'])
+def camera_capture_stats(camera_id):
+    stats = get_capture_stats(camera_id)
+    if not stats:
+        return jsonify({'error': 'Camera is not capturing'}), 404
+    return jsonify(stats[camera_id]), 200
+
+
+@camera_bp.route('/admin/camera/reconnect_status', methods=['GET'])
+def reconnect_status():
+    """ Reconnect schedule per camera: state, failed attempts and next retry time. """
+    return jsonify(get_reconnect_status()), 200
+
+
+@camera_bp.route('/admin/camera/<int:camera_id>/reconnect_status', methods=['GET'])
+def camera_reconnect_status(camera_id):
+    schedule = get_reconnect_status().get(camera_id)
+    if schedule is None:
+        return jsonify({'error': 'Camera is not scheduled'}), 404
+    return jsonify(schedule), 200
+
+
 @camera_bp.route('/stream/<int:camera_id>')
 def stream(camera_id):
-    """ Stream processed frames for a given camera. """
+    """ Stream processed frames for a given camera from its shared-memory frame bus. """
     def generate():
-        while True:
+        ring = None
+        last_seq = -1
+        idle_since = time.time()
+        try:
+            while True:
+                if ring is None or ring.closed:
+                    ring = open_consumer_ring(camera_id)
+                    if ring is None:
+                        time.sleep(0.3)
+                        continue
+
+                seq, frame = ring.read_latest()
+                if ring.closed:
+                    # Closed by the producer in this process (restart / resolution change): attach to the new one
+                    ring = None
+                    continue
+                if seq <= last_seq or frame is None:
+                    # The producer may have recreated the ring (restart / resolution change): re-attach
+                    if time.time() - idle_since > 5:
+                        close_consumer_ring(ring)
+                        ring, last_seq, idle_since = None, -1, time.time()
+                    time.sleep(0.1)
+                    continue
 
-            if camera_id in processed_frames:
-                frame = processed_frames[camera_id]
                 ret, buffer = cv2.imencode('.jpg', frame)
-                if not ret:
+                if not ret or not ring.is_current(seq):
                     continue
+                last_seq, idle_since = seq, time.time()
                 yield (b'--frame\r\n'
                        b'Content-Type: image/jpeg\r\n\r\n' + buffer.tobytes() + b'\r\n')
-            else:
-                time.sleep(0.3)
+        finally:
+            close_consumer_ring(ring)
 
     return Response(generate(), mimetype='multipart/x-mixed-replace; boundary=frame')
 
@@ -1,8 +1,36 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import inspect, text
 
 db = SQLAlchemy()
 
+# Columns added to existing tables after their first release. db.create_all() only creates missing
+# tables, so these are added in place on older databases; DDL mirrors the model definitions.
+ADDED_COLUMNS = {
+    "camera": (
+        ("ingest_backend", "VARCHAR(20) NOT NULL DEFAULT 'opencv'"),
+        ("inference_width", "INTEGER"),
+        ("inference_height", "INTEGER"),
+        ("decode_mode", "VARCHAR(20) NOT NULL DEFAULT 'auto'"),
+        ("roi_polygons", "TEXT"),
+        ("tile_size", "INTEGER"),
+        ("tile_overlap", "FLOAT NOT NULL DEFAULT 0.2"),
+    )
+}
+
 def init_db(app):
     db.init_app(app)
+    with app.app_context():
+        upgrade_schema()
 
 
+def upgrade_schema():
+    """Add any missing columns of ADDED_COLUMNS; safe to run on every start."""
+    inspector = inspect(db.engine)
+    with db.engine.begin() as connection:
+        for table, columns in ADDED_COLUMNS.items():
+            if not inspector.has_table(table):
+                continue  # create_all() builds it with every column
+            existing = {column["name"] for column in inspector.get_columns(table)}
+            for name, ddl in columns:
+                if name not in existing:
+                    connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {ddl}"))
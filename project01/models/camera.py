@@ -1,3 +1,4 @@
+import json
 from models import db
 
 class Camera(db.Model):
@@ -7,4 +8,32 @@ class Camera(db.Model):
     channel_url = db.Column(db.String(100), nullable=False)
     description = db.Column(db.String(100), nullable=False)
     nvr_id = db.Column(db.Integer, db.ForeignKey('nvr.id'), nullable=True)
+    # Ingest backend used by the capture thread: "opencv" or "ffmpeg"
+    ingest_backend = db.Column(db.String(20), nullable=False, default='opencv', server_default='opencv')
+    # Frame size the pipeline works at (decoder scaling / one early resize); NULL keeps the stream size
+    inference_width = db.Column(db.Integer, nullable=True)
+    inference_height = db.Column(db.Integer, nullable=True)
+    # Decoder sampling: "auto" (keyframes only when the sample rate allows it), "full" or "keyframe"
+    decode_mode = db.Column(db.String(20), nullable=False, default='auto', server_default='auto')
+    # Regions of interest as JSON: [[[x, y], ...], ...] normalised to 0..1; NULL means the whole frame
+    roi_polygons = db.Column(db.Text, nullable=True)
+    # Tiled inference for distant objects: square tile size in pixels (NULL = off) and overlap fraction
+    tile_size = db.Column(db.Integer, nullable=True)
+    tile_overlap = db.Column(db.Float, nullable=False, default=0.2, server_default='0.2')
     recordings = db.relationship('Recording', backref='camera', lazy=True)
+
+    def processing_options(self):
+        """Per-camera settings handed to the processing thread."""
+        return {
+            "nvr_id": self.nvr_id,
+            "ingest_backend": self.ingest_backend or "opencv",
+            "decode_mode": self.decode_mode or "auto",
+            "inference_size": (self.inference_width, self.inference_height)
+            if self.inference_width and self.inference_height else None,
+            "roi": self.roi(),
+            "tiling": {"size": self.tile_size, "overlap": self.tile_overlap if self.tile_overlap is not None else 0.2}
+            if self.tile_size else None
+        }
+
+    def roi(self):
+        return json.loads(self.roi_polygons) if self.roi_polygons else None
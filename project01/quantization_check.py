@@ -0,0 +1,136 @@
+"""Compare int8-quantized detections against the fp32 models on a folder of images.
+
+Run from the repository root:
+
+    python project01/quantization_check.py --model human --images path/to/frames
+    python project01/quantization_check.py --model animal --images path/to/frames --iou 0.5
+
+An fp32 detection counts as recovered when the int8 model finds a box of the
+same class with IoU >= --iou. The report gives recall/precision of the int8
+model against fp32, the confidence drift of matched boxes, and mean latency of
+each, so the quantization mode in modelUsageStatus.json can be chosen per model.
+"""
+import argparse
+import os
+import time
+
+import cv2
+import torch
+
+from service.rtdetr_manager_service import load_model_paths
+from service.human_processor_service import RTDETRProcessor
+from service.animal_image_procesor import AnimalDetectionProcessor
+from service.detection_array_service import to_dicts
+
+IMAGE_EXTENSIONS = (".jpg", ".jpeg", ".png", ".bmp")
+
+
+def load_processor(model, quantization):
+    animal_path, human_path = load_model_paths()
+    if model == "human":
+        processor = RTDETRProcessor(model_name=human_path, quantization=quantization)
+        return lambda frame: to_dicts(processor.get_detections(frame), decimals=4), processor
+    processor = AnimalDetectionProcessor(cls_checkpoint_dir=animal_path, quantization=quantization)
+    return lambda frame: to_dicts(processor.process_frame_for_detection(frame), decimals=4), processor
+
+
+def iou(a, b):
+    ix = max(0, min(a["xmax"], b["xmax"]) - max(a["xmin"], b["xmin"]))
+    iy = max(0, min(a["ymax"], b["ymax"]) - max(a["ymin"], b["ymin"]))
+    inter = ix * iy
+    area_a = (a["xmax"] - a["xmin"]) * (a["ymax"] - a["ymin"])
+    area_b = (b["xmax"] - b["xmin"]) * (b["ymax"] - b["ymin"])
+    union = area_a + area_b - inter
+    return inter / union if union > 0 else 0.0
+
+
+def match(reference, candidate, threshold):
+    """Greedy one-to-one matching by IoU; returns the matched (reference, candidate) pairs."""
+    pairs = []
+    used = set()
+    for ref in sorted(reference, key=lambda d: d["confidence"], reverse=True):
+        best, best_iou = None, threshold
+        for idx, cand in enumerate(candidate):
+            if idx in used or cand["class"] != ref["class"]:
+                continue
+            overlap = iou(ref, cand)
+            if overlap >= best_iou:
+                best, best_iou = idx, overlap
+        if best is not None:
+            used.add(best)
+            pairs.append((ref, candidate[best]))
+    return pairs
+
+
+def classify(processor, frame):
+    """Top-1 label of the animal classifier on the whole frame."""
+    rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+    inputs = processor.cls_processor(images=rgb, return_tensors="pt")
+    inputs = {k: v.to(processor.device) for k, v in inputs.items()}
+    with torch.no_grad():
+        logits = processor.cls_model(**inputs).logits
+    return int(logits.argmax(-1).item())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", choices=("human", "animal"), required=True)
+    parser.add_argument("--images", required=True, help="Folder of images to compare on")
+    parser.add_argument("--quantization", default="dynamic_int8")
+    parser.add_argument("--iou", type=float, default=0.5)
+    args = parser.parse_args()
+
+    paths = sorted(
+        os.path.join(args.images, name) for name in os.listdir(args.images)
+        if name.lower().endswith(IMAGE_EXTENSIONS)
+    )
+    if not paths:
+        raise SystemExit(f"No images found in {args.images}")
+
+    fp32, fp32_processor = load_processor(args.model, "none")
+    int8, int8_processor = load_processor(args.model, args.quantization)
+
+    totals = {"reference": 0, "candidate": 0, "matched": 0, "conf_drift": 0.0,
+              "fp32_time": 0.0, "int8_time": 0.0, "cls_agree": 0, "images": 0}
+    for path in paths:
+        frame = cv2.imread(path)
+        if frame is None:
+            print(f"Skipping unreadable image {path}")
+            continue
+
+        started = time.perf_counter()
+        reference = fp32(frame)
+        totals["fp32_time"] += time.perf_counter() - started
+        started = time.perf_counter()
+        candidate = int8(frame)
+        totals["int8_time"] += time.perf_counter() - started
+
+        pairs = match(reference, candidate, args.iou)
+        totals["images"] += 1
+        totals["reference"] += len(reference)
+        totals["candidate"] += len(candidate)
+        totals["matched"] += len(pairs)
+        totals["conf_drift"] += sum(abs(ref["confidence"] - cand["confidence"]) for ref, cand in pairs)
+        if args.model == "animal":
+            totals["cls_agree"] += classify(fp32_processor, frame) == classify(int8_processor, frame)
+
+    images = totals["images"] or 1
+    print(f"Images compared         : {totals['images']}")
+    print(f"fp32 detections         : {totals['reference']}")
+    print(f"{args.quantization} detections : {totals['candidate']}")
+    print(f"Recall vs fp32          : {totals['matched'] / totals['reference']:.3f}" if totals["reference"] else
+          "Recall vs fp32          : n/a (no fp32 detections)")
+    print(f"Precision vs fp32       : {totals['matched'] / totals['candidate']:.3f}" if totals["candidate"] else
+          "Precision vs fp32       : n/a (no quantized detections)")
+    if totals["matched"]:
+        print(f"Mean confidence drift   : {totals['conf_drift'] / totals['matched']:.4f}")
+    if args.model == "animal":
+        print(f"Classifier top-1 agree  : {totals['cls_agree'] / images:.3f}")
+    print(f"Mean fp32 latency       : {1000 * totals['fp32_time'] / images:.1f} ms")
+    print(f"Mean {args.quantization} latency : {1000 * totals['int8_time'] / images:.1f} ms")
+    if totals["int8_time"]:
+        print(f"Speedup                 : {totals['fp32_time'] / totals['int8_time']:.2f}x")
+
+
+if __name__ == "__main__":
+    main()
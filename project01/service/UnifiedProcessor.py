@@ -1,49 +1,147 @@
-import threading
 import json
 import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from service.animal_image_procesor import AnimalDetectionProcessor
 from service.human_processor_service import RTDETRProcessor
+from service.model_warmup_service import warm_up, WARMUP_FRAME_SHAPE
+from service.detection_array_service import concat_detections
+from service.model_loading_service import load_models
+
+# Detectors each pipeline mode needs; "both" is the combined mode for sites that want everything
+MODE_DETECTORS = {
+    "human": ("human",),
+    "animal": ("animal",),
+    "both": ("animal", "human")
+}
+DETECTION_MODES = tuple(MODE_DETECTORS)
+
+# How many inferences may run concurrently on each model (weights are shared, not copied).
+# VIGILNET_CONCURRENCY_<MODEL> overrides the shared default for a single model.
+MAX_CONCURRENT_INFERENCES = int(os.environ.get("VIGILNET_MODEL_CONCURRENCY", "4"))
+MODEL_CONCURRENCY = {
+    name: int(os.environ.get(f"VIGILNET_CONCURRENCY_{name.upper()}", MAX_CONCURRENT_INFERENCES))
+    for name in ("animal", "human")
+}
+
+# Shared helper threads for the combined mode, instead of spawning threads on every frame;
+# sized like the largest per-model concurrency limit of the model pool
+detector_executor = ThreadPoolExecutor(max_workers=max(MODEL_CONCURRENCY.values()), thread_name_prefix="detector")
 
 class UnifiedProcessor:
     _instance = None
 
-    def __new__(cls, animal_model_path=None, human_model_path=None, confidence_threshold=0.45):
+    def __new__(cls, animal_model_path=None, human_model_path=None, confidence_threshold=0.45, detectors=None,
+                backends=None, quantization=None, load=True):
         # if cls._instance is None:
         cls._instance = super(UnifiedProcessor, cls).__new__(cls)
-        cls._instance.initialize(animal_model_path, human_model_path, confidence_threshold)
+        cls._instance.initialize(animal_model_path, human_model_path, confidence_threshold, detectors, backends,
+                                 quantization, load)
         return cls._instance
 
-    def initialize(self, animal_model_path, human_model_path, confidence_threshold=0.45):
-        self.animal_processor = AnimalDetectionProcessor(
-            cls_checkpoint_dir=animal_model_path,
-            confidence_threshold=confidence_threshold
-        )
-        self.rtdetr_processor = RTDETRProcessor(
-            model_name=human_model_path,
-            confidence_threshold=confidence_threshold
-        )
-
-    def process_frame(self, frame_id, frame, camera_id):
-        combined_detections = []
-        lock = threading.Lock()
-
-        def append_detections(results):
-            with lock:
-                combined_detections.extend(results)
-
-        def animal_processing():
-            animal_results = self.animal_processor.process_frame_for_detection(frame)
-            append_detections(animal_results)
-
-        def rtdetr_processing():
-            rtdetr_results = self.rtdetr_processor.get_detections(frame)
-            append_detections(rtdetr_results)
-
-        animal_thread = threading.Thread(target=animal_processing)
-        rtdetr_thread = threading.Thread(target=rtdetr_processing)
-        animal_thread.start()
-        rtdetr_thread.start()
-        animal_thread.join()
-        rtdetr_thread.join()
-
-        return combined_detections
+    def initialize(self, animal_model_path, human_model_path, confidence_threshold=0.45, detectors=None,
+                   backends=None, quantization=None, load=True):
+        self.animal_model_path = animal_model_path
+        self.human_model_path = human_model_path
+        self.confidence_threshold = confidence_threshold
+        self.backends = backends or {}
+        self.quantization = quantization or {}
+        self.detectors = tuple(detectors or MODE_DETECTORS["both"])
+        self.animal_processor = None
+        self.rtdetr_processor = None
+        self.ready = {name: threading.Event() for name in self.detectors}  # set once a detector is loaded and warm
+        if load:
+            self.load()
+
+    def load(self, batch_sizes=None):
+        """Load every detector concurrently; with `batch_sizes`, each is warmed up as soon as it has loaded.
+
+        A detector's `ready` event is set when it can serve, independently of the others.
+        """
+        def loader(name):
+            def run():
+                processor = self.load_detector(name)
+                if not batch_sizes:
+                    self.ready[name].set()
+                return processor
+            return run
+
+        def warmer(name):
+            def run(_):
+                self.warm_up_detector(name, batch_sizes)
+                self.ready[name].set()
+            return run
+
+        load_models({name: (loader(name), warmer(name) if batch_sizes else None) for name in self.detectors})
+
+    def load_detector(self, name):
+        if name == "animal":
+            self.animal_processor = AnimalDetectionProcessor(
+                cls_checkpoint_dir=self.animal_model_path,
+                confidence_threshold=self.confidence_threshold,
+                det_backend=self.backends.get("animal", "torch"),
+                quantization=self.quantization.get("animal", "none")
+            )
+            processor = self.animal_processor
+        else:
+            self.rtdetr_processor = RTDETRProcessor(
+                model_name=self.human_model_path,
+                confidence_threshold=self.confidence_threshold,
+                backend=self.backends.get("human", "torch"),
+                quantization=self.quantization.get("human", "none")
+            )
+            processor = self.rtdetr_processor
+        return processor
+
+    def is_ready(self, mode):
+        """True once every detector the mode needs is loaded (and warmed up, when warm-up was requested)."""
+        selected = self.detectors_for(mode)
+        return bool(selected) and all(self.ready[name].is_set() for name in selected)
+
+    def detectors_for(self, mode):
+        """Detector names a mode runs, restricted to the ones this instance has loaded."""
+        if mode not in MODE_DETECTORS:
+            raise ValueError(f"Unknown detection mode '{mode}'. Expected one of {DETECTION_MODES}")
+        return tuple(name for name in MODE_DETECTORS[mode] if name in self.detectors)
+
+    def process_frame(self, frame_id, frame, camera_id, mode="both"):
+        return self.process_frames([frame], mode=mode)[0]
+
+    def run_detector(self, name, frames):
+        if name == "animal":
+            # Two-stage: DETR boxes, then one batched species classification over all crops
+            return self.animal_processor.process_frames(frames)
+        return self.rtdetr_processor.get_detections_batch(frames)
+
+    def warm_up(self, batch_sizes=(1,)):
+        """Run dummy batches through every loaded detector before cameras use them."""
+        reports = {}
+        for name in self.detectors:
+            reports.update(self.warm_up_detector(name, batch_sizes))
+        return reports
+
+    def warm_up_detector(self, name, batch_sizes=(1,)):
+        reports = {name: warm_up(name, lambda frames: self.run_detector(name, frames), batch_sizes=batch_sizes)}
+        if name == "animal":
+            # Dummy frames rarely yield boxes, so the crop classifier is warmed up on its own
+            reports["animal-classifier"] = warm_up("animal-classifier", self.animal_processor.classify_regions,
+                                                   batch_sizes=batch_sizes, frame_shapes=[WARMUP_FRAME_SHAPE])
+        return reports
+
+    def process_frames(self, frames, mode="both"):
+        """Run the detectors of `mode` over a batch of frames: one forward pass per model."""
+        selected = self.detectors_for(mode)
+        if len(selected) == 1:
+            # A single detector runs inline; no helper threads needed
+            return self.run_detector(selected[0], frames)
+
+        # Other detectors run on the shared helper threads while the last one runs on the caller's thread
+        futures = {name: detector_executor.submit(self.run_detector, name, frames) for name in selected[:-1]}
+        results = {selected[-1]: self.run_detector(selected[-1], frames)}
+        for name, future in futures.items():
+            results[name] = future.result()
+
+        return [
+            concat_detections(per_model)
+            for per_model in zip(*(results[name] for name in selected))
+        ]
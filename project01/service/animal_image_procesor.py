@@ -4,18 +4,28 @@ import torch
 import os
 import pickle
 import logging
-from transformers import AutoImageProcessor, AutoModelForObjectDetection, AutoModelForImageClassification
-from PIL import Image
+from transformers import AutoImageProcessor, AutoModelForImageClassification
+from service.onnx_runtime_service import load_detector
+from service.quantization_service import quantize_model
+from service.model_warmup_service import compile_model
+from service.preprocessing_service import build_preprocessor
+from service.detection_array_service import DETECTION_DTYPE, LabelFilter, empty_detections
 
 logging.basicConfig(level=logging.DEBUG)
 logger = logging.getLogger(__name__)
 
+CRITICAL_ANIMALS = ("deer", "wolf", "leopard")
+STRICT_CONFIDENCE = 0.65  # Stricter threshold for critical animals
+
+
 class AnimalDetectionProcessor:
     def __init__(
         self,
         det_model_name="modelRepository/detr-resn/default",
         cls_checkpoint_dir=None,
-        confidence_threshold=0.69
+        confidence_threshold=0.69,
+        det_backend="torch",
+        quantization="none"
     ):
         self.det_model_name = det_model_name
         self.cls_checkpoint_dir = cls_checkpoint_dir
@@ -29,19 +39,28 @@ class AnimalDetectionProcessor:
             if not os.path.exists(det_model_name):
                 raise FileNotFoundError(f"Detection model directory {det_model_name} does not exist")
             self.det_processor = AutoImageProcessor.from_pretrained(det_model_name)
-            self.det_model = AutoModelForObjectDetection.from_pretrained(det_model_name)
+            self.det_preprocessor = build_preprocessor(self.det_processor)
+            self.det_model, self.det_backend = load_detector(det_model_name, det_backend)
         except Exception as e:
             logger.error(f"Failed to load detection model {det_model_name}: {e}")
             raise RuntimeError(f"Cannot load detection model: {e}")
 
-        # Move detection model to device
-        if any(param.is_meta for param in self.det_model.parameters()):
+        # Move detection model to device (the ONNX Runtime session stays on the CPU provider)
+        if self.det_backend == "onnx":
+            self.det_device = torch.device("cpu")
+        elif any(param.is_meta for param in self.det_model.parameters()):
             logger.info("Detection model has meta tensors, using to_empty to move to device")
             self.det_model.to_empty(device=self.device)
+            self.det_model.eval()
+            self.det_device = self.device
         else:
             self.det_model.to(self.device)
-        self.det_model.eval()
-        logger.info(f"Detection model loaded from: {det_model_name}")
+            self.det_model.eval()
+            self.det_device = self.device
+        self.quantization = quantization
+        self.det_model = quantize_model(self.det_model, quantization, self.det_device, name=det_model_name)
+        self.det_model = compile_model(self.det_model, ("logits", "pred_boxes"), name=det_model_name)
+        logger.info(f"Detection model loaded from: {det_model_name} ({self.det_backend})")
 
         # Load classification processor and model
         try:
@@ -50,6 +69,7 @@ class AnimalDetectionProcessor:
             if not os.path.exists(os.path.join(cls_checkpoint_dir, "preprocessor_config.json")):
                 raise FileNotFoundError(f"Missing preprocessor_config.json in {cls_checkpoint_dir}")
             self.cls_processor = AutoImageProcessor.from_pretrained(cls_checkpoint_dir)
+            self.cls_preprocessor = build_preprocessor(self.cls_processor)
             self.cls_model = AutoModelForImageClassification.from_pretrained(cls_checkpoint_dir)
         except Exception as e:
             logger.error(f"Failed to load classification model from {cls_checkpoint_dir}: {e}")
@@ -62,6 +82,8 @@ class AnimalDetectionProcessor:
         else:
             self.cls_model.to(self.device)
         self.cls_model.eval()
+        self.cls_model = quantize_model(self.cls_model, quantization, self.device, name=cls_checkpoint_dir)
+        self.cls_model = compile_model(self.cls_model, ("logits",), name=cls_checkpoint_dir)
         logger.info(f"Classification model loaded from: {cls_checkpoint_dir}")
 
         # Initialize animal classes and mappings
@@ -119,6 +141,8 @@ class AnimalDetectionProcessor:
         self.det_model.config.id2label = new_id2label
         self.det_model.config.label2id = new_label2id
         logger.info(f"DETR model restricted to animal classes: {list(new_label2id.keys())}")
+        # Class-id mask over the restricted labels; only detections of valid classes are kept
+        self.label_filter = LabelFilter(new_id2label, keep=self.valid_detr_classes)
 
         # Update classification model config with animal classes
         if len(self.cls_model.config.id2label) != len(self.animal_classes):
@@ -129,6 +153,12 @@ class AnimalDetectionProcessor:
         self.cls_model.config.id2label = {i: cls for i, cls in enumerate(self.animal_classes)}
         self.cls_model.config.label2id = {cls: i for i, cls in enumerate(self.animal_classes)}
         self.cls_model.config.num_labels = len(self.animal_classes)
+        # Classifier outputs that are animal classes; built once instead of on every crop
+        self.cls_labels = np.array([label.lower() for label in self.animal_classes], dtype=DETECTION_DTYPE["class"])
+        self.cls_valid_indices = torch.tensor(
+            [idx for idx, label in self.cls_model.config.id2label.items() if label.lower() in self.animal_classes],
+            dtype=torch.long, device=self.device
+        )
 
         # Define softened kernel to preserve animal features
         self.kernel = np.array([
@@ -151,168 +181,183 @@ class AnimalDetectionProcessor:
     def process_frame_for_detection(self, frame):
         if frame is None or frame.size == 0:
             logger.warning("Invalid frame for detection")
-            return []
-
-        # Convert frame to RGB and process using the model
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        inputs = self.det_processor(images=rgb, return_tensors="pt")
-        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+            return empty_detections()
+        return self.process_frames_for_detection([frame])[0]
+
+    def process_frames_for_detection(self, frames):
+        """Batched DETR pass; frames of different sizes are padded together by the processor."""
+        valid = [i for i, frame in enumerate(frames) if frame is not None and frame.size > 0]
+        batch_results = [empty_detections() for _ in frames]
+        if not valid:
+            return batch_results
+
+        # Preprocess straight from BGR, or convert frames to RGB for the HF processor
+        if self.det_preprocessor is not None:
+            inputs = self.det_preprocessor([frames[i] for i in valid])
+        else:
+            rgbs = [cv2.cvtColor(frames[i], cv2.COLOR_BGR2RGB) for i in valid]
+            inputs = self.det_processor(images=rgbs, return_tensors="pt")
+        inputs = {k: v.to(self.det_device) for k, v in inputs.items()}
 
         with torch.no_grad():
             outputs = self.det_model(**inputs)
 
-        target_sizes = torch.tensor([rgb.shape[:2]]).to(self.device)
-        detections = self.det_processor.post_process_object_detection(
+        target_sizes = torch.tensor([frames[i].shape[:2] for i in valid]).to(self.det_device)
+        batch_detections = self.det_processor.post_process_object_detection(
             outputs, target_sizes=target_sizes, threshold=0.4  # Lowered threshold to capture more detections
-        )[0]
-
-        result = []
-        for score, label, box in zip(detections["scores"], detections["labels"], detections["boxes"]):
-            label_name = self.det_model.config.id2label.get(label.item(), "unknown").lower()
-
-            # Only keep detections that match the valid classes
-            if label_name in self.valid_detr_classes:
-                xmin, ymin, xmax, ymax = [int(coord) for coord in box.tolist()]
-                result.append({
-                    "class": label_name,
-                    "confidence": score.item(),
-                    "xmin": xmin,
-                    "ymin": ymin,
-                    "xmax": xmax,
-                    "ymax": ymax
-                })
-
-        return result
-
-    def classify_region(self, image, box, det_label):
-        x_min, y_min, x_max, y_max = box
-        x_min = max(0, x_min)
-        y_min = max(0, y_min)
-        x_max = min(image.width, x_max)
-        y_max = min(image.height, y_max)
-
-        if x_max <= x_min or y_max <= y_min:
-            return None, 0.0
-
-        cropped = image.crop((x_min, y_min, x_max, y_max))
-        inputs = self.cls_processor(images=cropped, return_tensors="pt")
+        )
+
+        for i, detections in zip(valid, batch_detections):
+            batch_results[i] = self.label_filter.select(detections)
+
+        return batch_results
+
+    def classify_regions(self, crops):
+        """Classify BGR crops in one batched forward pass; returns (labels, confidences) arrays."""
+        labels = np.full(len(crops), "", dtype=self.cls_labels.dtype)
+        confidences = np.zeros(len(crops), dtype=np.float32)
+        if not crops or not len(self.cls_valid_indices):
+            return labels, confidences
+
+        if self.cls_preprocessor is not None:
+            inputs = self.cls_preprocessor(crops)
+        else:
+            rgbs = [cv2.cvtColor(crop, cv2.COLOR_BGR2RGB) for crop in crops]
+            inputs = self.cls_processor(images=rgbs, return_tensors="pt")
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
         with torch.no_grad():
             logits = self.cls_model(**inputs).logits
-        probs = torch.softmax(logits, dim=-1)
+        valid_probs = torch.softmax(logits, dim=-1).index_select(1, self.cls_valid_indices)
+        best_probs, best = valid_probs.max(dim=1)
+
+        labels[:] = self.cls_labels[self.cls_valid_indices[best].cpu().numpy()]
+        confidences[:] = best_probs.cpu().numpy()
+        return labels, confidences
+
+    def resolve_label(self, det_label, det_score, pred_label, confidence):
+        """Combine the DETR label and the classifier label; returns (label, confidence) or None to discard."""
+        # Validation for critical animals
+        valid_mappings = self.detr_to_animal.get(det_label, [])
+        if pred_label in CRITICAL_ANIMALS:
+            # Ensure classification aligns with DETR mapping
+            if pred_label not in valid_mappings and det_label not in CRITICAL_ANIMALS:
+                # Special handling for deer (no direct COCO class)
+                if pred_label == "deer" and det_label in ["cow", "sheep"]:
+                    if confidence >= STRICT_CONFIDENCE:
+                        logger.info(f"High-confidence deer classification from {det_label}: {pred_label} ({confidence:.2f})")
+                        return pred_label, confidence
+                    logger.warning(
+                        f"Low confidence for deer with DETR {det_label}: {pred_label} ({confidence:.2f}). Discarding."
+                    )
+                    return None
+                logger.warning(f"Invalid classification for {pred_label} with DETR label {det_label}. Discarding.")
+                return None
+            if confidence >= STRICT_CONFIDENCE:
+                logger.info(f"High-confidence critical animal: {pred_label} ({confidence:.2f})")
+                return pred_label, confidence
+            logger.warning(
+                f"Low confidence for critical animal {pred_label} ({confidence:.2f}). Checking DETR fallback."
+            )
 
-        valid_indices = [idx for idx, label in self.cls_model.config.id2label.items() if label.lower() in self.animal_classes]
-        if not valid_indices:
-            return None, 0.0
+        # Standard classification logic
+        if pred_label in self.target_animals and confidence > 0.2:
+            logger.info(f"High-confidence classification: {pred_label} ({confidence:.2f})")
+            return pred_label, confidence
+        if det_label in self.target_animals and det_score > 0.2:
+            logger.info(f"Low-confidence classification, fallback to DETR: {det_label} ({det_score:.2f})")
+            return det_label, det_score
+        if det_label in self.target_animals or pred_label in self.target_animals:
+            used_label, used_conf = (det_label, det_score) if det_label in self.target_animals else (pred_label, confidence)
+            logger.warning(
+                f"Animal detected with low confidence: {det_label} / {pred_label} with confidence {used_conf:.2f}"
+            )
+            return used_label, used_conf
+        logger.debug(f"Filtered out detection: {det_label} / {pred_label}")
+        return None
+
+    def detect_and_classify(self, frames):
+        """Two-stage pass over a batch: DETR finds animals, every crop of every frame is classified together.
 
-        valid_probs = probs[0, valid_indices]
-        if valid_probs.numel() == 0:
-            return None, 0.0
+        Returns, per frame, the DETR detections and the resolved (label, confidence) of each (None if discarded).
+        """
+        filtered = [self.apply_kernel(frame) if frame is not None and frame.size > 0 else frame for frame in frames]
+        per_frame = self.process_frames_for_detection(filtered)
 
-        pred_idx = valid_indices[torch.argmax(valid_probs).item()]
-        pred_label = self.cls_model.config.id2label[pred_idx].lower()
-        confidence = valid_probs.max().item()
+        crops, owners = [], []
+        for frame_index, (frame, detections) in enumerate(zip(filtered, per_frame)):
+            if not len(detections):
+                continue
+            height, width = frame.shape[:2]
+            x0 = detections["xmin"].clip(0, width)
+            y0 = detections["ymin"].clip(0, height)
+            x1 = detections["xmax"].clip(0, width)
+            y1 = detections["ymax"].clip(0, height)
+            for det_index in np.flatnonzero((x1 > x0) & (y1 > y0)):
+                crops.append(frame[y0[det_index]:y1[det_index], x0[det_index]:x1[det_index]])
+                owners.append((frame_index, det_index))
+
+        pred_labels, pred_confidences = self.classify_regions(crops)
+        predictions = {owner: (str(label), float(conf))
+                       for owner, label, conf in zip(owners, pred_labels, pred_confidences)}
 
-        return (pred_label, confidence) if pred_label in self.animal_classes else (None, 0.0)
+        results = []
+        for frame_index, detections in enumerate(per_frame):
+            resolved = []
+            for det_index in range(len(detections)):
+                det_label = str(detections["class"][det_index])
+                if det_label == "person":
+                    resolved.append(None)
+                    continue
+                pred_label, confidence = predictions.get((frame_index, det_index), (None, 0.0))
+                resolved.append(self.resolve_label(det_label, float(detections["confidence"][det_index]),
+                                                   pred_label, confidence))
+            results.append((detections, resolved))
+        return results
+
+    def process_frames(self, frames):
+        """Detect-then-classify a batch of BGR frames; one structured detection array per frame, labelled by species."""
+        batch_results = []
+        for detections, resolved in self.detect_and_classify(frames):
+            animals = detections[np.array([final is not None for final in resolved], dtype=bool)]
+            if len(animals):
+                finals = [final for final in resolved if final is not None]
+                animals["class"] = [label for label, _ in finals]
+                animals["confidence"] = [conf for _, conf in finals]
+            batch_results.append(animals)
+        return batch_results
 
     def process_frame(self, frame_id, frame, camera_id):
         if frame is None or frame.size == 0:
             return
 
-        filtered_frame = self.apply_kernel(frame)
-        image = Image.fromarray(cv2.cvtColor(filtered_frame, cv2.COLOR_BGR2RGB))
-        detections = self.process_frame_for_detection(filtered_frame)
+        detections, resolved = self.detect_and_classify([frame])[0]
         results = []
-
-        # Critical animals with stricter confidence
-        critical_animals = ["deer", "wolf", "leopard"]
-        strict_confidence = 0.65  # Stricter threshold for critical animals
-
-        for det in detections:
-            det_label, det_score, box = det["label"], det["score"], det["box"]
-            if det_label == "person":
+        for det, final in zip(detections, resolved):
+            if final is None:
                 continue
-
-            pred_label, confidence = self.classify_region(image, box, det_label)
-
-            final_label = None
-            final_conf = 0.0
-
-            # Validation for critical animals
-            valid_mappings = self.detr_to_animal.get(det_label, [])
-            if pred_label in critical_animals:
-                # Ensure classification aligns with DETR mapping
-                if pred_label not in valid_mappings and det_label not in critical_animals:
-                    # Special handling for deer (no direct COCO class)
-                    if pred_label == "deer" and det_label in ["cow", "sheep"]:
-                        if confidence >= strict_confidence:
-                            final_label = pred_label
-                            final_conf = confidence
-                            logger.info(f"High-confidence deer classification from {det_label}: {pred_label} ({confidence:.2f})")
-                        else:
-                            logger.warning(
-                                f"Low confidence for deer with DETR {det_label}: {pred_label} ({confidence:.2f}). Discarding."
-                            )
-                            continue
-                    else:
-                        logger.warning(
-                            f"Invalid classification for {pred_label} with DETR label {det_label}. Discarding."
-                        )
-                        continue
-                elif confidence >= strict_confidence:
-                    final_label = pred_label
-                    final_conf = confidence
-                    logger.info(f"High-confidence critical animal: {pred_label} ({confidence:.2f})")
-                else:
-                    logger.warning(
-                        f"Low confidence for critical animal {pred_label} ({confidence:.2f}). Checking DETR fallback."
-                    )
-
-            # Standard classification logic
-            if not final_label and pred_label in self.target_animals and confidence > 0.2:
-                final_label = pred_label
-                final_conf = confidence
-                logger.info(f"High-confidence classification: {pred_label} ({confidence:.2f})")
-
-            elif not final_label and det_label in self.target_animals and det_score > 0.2:
-                final_label = det_label
-                final_conf = det_score
-                logger.info(f"Low-confidence classification, fallback to DETR: {det_label} ({det_score:.2f})")
-
-            elif not final_label and (det_label in self.target_animals or (pred_label in self.target_animals if pred_label else False)):
-                used_label = det_label if det_label in self.target_animals else pred_label
-                used_conf = det_score if det_label in self.target_animals else (confidence if confidence is not None else 0.0)
-                logger.warning(
-                    f"Animal detected with low confidence: {det_label} / {pred_label} with confidence {used_conf:.2f}"
+            final_label, final_conf = final
+            det_label = str(det["class"])
+            box = [int(det["xmin"]), int(det["ymin"]), int(det["xmax"]), int(det["ymax"])]
+            results.append({
+                "camera_id": camera_id,
+                "frame_id": frame_id,
+                "class": final_label,
+                "de_confidence": round(final_conf, 4),
+                "det_class": det_label,
+                "confidence": round(float(det["confidence"]), 4),
+                "xmin": box[0],
+                "ymin": box[1],
+                "xmax": box[2],
+                "ymax": box[3],
+                "is_target_animal": final_label in self.target_animals
+            })
+            # Detailed logging for critical animals
+            if final_label in CRITICAL_ANIMALS:
+                logger.info(
+                    f"Critical animal detected: {final_label} (DETR: {det_label}, "
+                    f"Conf: {final_conf:.2f}, Box: {box})"
                 )
-                final_label = used_label
-                final_conf = used_conf
-
-            else:
-                logger.debug(f"Filtered out detection: {det_label} / {pred_label}")
-                continue
-
-            if final_label:
-                results.append({
-                    "camera_id": camera_id,
-                    "frame_id": frame_id,
-                    "class": final_label,
-                    "de_confidence": round(final_conf, 4),
-                    "det_class": det_label,
-                    "confidence": round(det_score, 4),
-                    "xmin": box[0],
-                    "ymin": box[1],
-                    "xmax": box[2],
-                    "ymax": box[3],
-                    "is_target_animal": final_label in self.target_animals
-                })
-                # Detailed logging for critical animals
-                if final_label in critical_animals:
-                    logger.info(
-                        f"Critical animal detected: {final_label} (DETR: {det_label}, "
-                        f"Conf: {final_conf:.2f}, Box: {box})"
-                    )
 
         pickle_dir = os.path.join("project02/detections/output_pickle")
         os.makedirs(pickle_dir, exist_ok=True)
@@ -0,0 +1,114 @@
+import logging
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+# Cross-camera batching: trade up to MAX_WAIT_MS of latency for larger forward passes
+BATCHING_ENABLED = os.environ.get("VIGILNET_BATCH_INFERENCE", "0") == "1"
+MAX_BATCH_SIZE = int(os.environ.get("VIGILNET_MAX_BATCH_SIZE", "8"))
+MAX_WAIT_MS = float(os.environ.get("VIGILNET_MAX_BATCH_WAIT_MS", "50"))
+
+
+class BatchInferenceServer:
+    """Collects frames submitted by camera threads and runs them through the model in batches.
+
+    A batch is dispatched when it reaches `max_batch_size` frames or when the
+    oldest pending frame has waited `max_wait_ms`. Each caller gets a Future
+    resolved with the detections of its own frame.
+    """
+
+    def __init__(self, infer_batch, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS, name="detector"):
+        self.infer_batch = infer_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self._pending = queue.Queue()
+        self._stop_event = threading.Event()
+        self._stats_lock = threading.Lock()
+        self.batch_size_counts = [0] * (self.max_batch_size + 1)
+        self.frames = 0
+        self.batches = 0
+        self.total_wait = 0.0
+        self.total_infer = 0.0
+        self._thread = threading.Thread(target=self._run, name=f"batch-{name}", daemon=True)
+        self._thread.start()
+
+    def submit(self, frame, callback=None):
+        """Queue a frame; returns a Future with its detections (callback, if given, gets the Future)."""
+        future = Future()
+        if callback is not None:
+            future.add_done_callback(callback)
+        self._pending.put((time.time(), frame, future))
+        return future
+
+    def infer(self, frame, timeout=None):
+        return self.submit(frame).result(timeout=timeout)
+
+    def _collect(self):
+        try:
+            first = self._pending.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        batch = [first]
+        deadline = first[0] + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            started = time.time()
+            frames = [frame for _, frame, _ in batch]
+            try:
+                results = self.infer_batch(frames)
+            except Exception as e:
+                logger.error(f"[Batch-{self.name}] Inference failed for a batch of {len(batch)}: {e}")
+                for _, _, future in batch:
+                    future.set_exception(e)
+                continue
+            finished = time.time()
+
+            for (_, _, future), result in zip(batch, results):
+                future.set_result(result)
+
+            with self._stats_lock:
+                self.batches += 1
+                self.frames += len(batch)
+                self.batch_size_counts[len(batch)] += 1
+                self.total_wait += sum(started - enqueued for enqueued, _, _ in batch)
+                self.total_infer += finished - started
+
+    def stop(self):
+        self._stop_event.set()
+        self._thread.join(timeout=2)
+
+    def stats(self):
+        with self._stats_lock:
+            return {
+                "name": self.name,
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "frames": self.frames,
+                "avg_batch_size": round(self.frames / self.batches, 2) if self.batches else 0.0,
+                "batch_size_histogram": {
+                    size: count for size, count in enumerate(self.batch_size_counts) if count
+                },
+                "avg_queue_wait_ms": round(1000 * self.total_wait / self.frames, 2) if self.frames else 0.0,
+                "avg_batch_inference_ms": round(1000 * self.total_infer / self.batches, 2) if self.batches else 0.0,
+                "pending": self._pending.qsize()
+            }
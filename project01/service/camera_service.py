@@ -19,7 +19,7 @@ def change_camera_url(nvr_id, nvr_url):
         print("looping through cameras ")
         for camera in cameras:
             print("Camera restart process restarted !!")
-            restart_processing(camera.id, camera.url)
+            restart_processing(camera.id, camera.url, camera.processing_options())
 
         db.session.commit()
         return jsonify({"message": "Camera URLs updated successfully"}), 200
@@ -0,0 +1,337 @@
+import atexit
+import itertools
+import logging
+import multiprocessing
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+# "0" keeps cameras as threads inside the web process, "auto" sizes the pool to the cores
+WORKER_PROCESSES = os.environ.get("VIGILNET_WORKER_PROCESSES", "0")
+EVENT_QUEUE_SIZE = 256
+STATS_INTERVAL = 2.0
+COMMAND_TIMEOUT = 60
+RELOAD_TIMEOUT = float(os.environ.get("VIGILNET_RELOAD_TIMEOUT_S", "900"))  # model reloads on all workers
+WATCHDOG_INTERVAL = 5.0
+SHUTDOWN_TIMEOUT = 10
+
+
+def configured_worker_count():
+    """Number of camera worker processes to run; 0 means the in-process thread mode."""
+    value = str(WORKER_PROCESSES).strip().lower()
+    if value == "auto":
+        # Every worker runs its own inference, so leave half the cores for intra-op threads
+        return max(1, (os.cpu_count() or 2) // 2)
+    try:
+        return max(0, int(value))
+    except ValueError:
+        logger.warning(f"Invalid VIGILNET_WORKER_PROCESSES={WORKER_PROCESSES!r}; using in-process threads")
+        return 0
+
+
+def worker_main(index, command_queue, event_queue, settings):
+    """Entry point of a camera worker process.
+
+    Runs the regular per-camera threads of video_processor_service for the cameras
+    assigned to this shard. Socket emits are forwarded to the web process over
+    `event_queue`, and capture/reconnect stats are reported periodically.
+    """
+    from service.log_notifier_service import init_ipc_notifier
+    init_ipc_notifier(event_queue)
+
+    from service import video_processor_service as vps
+    from service.reconnect_scheduler_service import reconnect_scheduler
+    from service.rtdetr_manager_service import get_processors, get_batch_stats, get_swap_reports
+    from service.model_warmup_service import get_warmup_reports, register_frame_shape
+    from service.latency_stats_service import get_latency_stats
+    from service.model_loading_service import get_model_load_status
+    from service.rtdetr_manager_service import concurrent_inferences
+    from service.thread_budget_service import apply_thread_budget, get_thread_layout
+
+    apply_thread_budget(settings.get("processes", 1), concurrent_inferences())
+    vps.model_changed(settings.get("model", "none"))
+    vps.change_frame_enhancer(settings.get("frame_enhancer", False))
+    for camera_id, inference_size in settings.get("inference_sizes", {}).items():
+        register_frame_shape(camera_id, inference_size)
+    # Models load in the background; cameras are accepted right away and start detecting once ready
+    threading.Thread(target=get_processors, daemon=True).start()
+    event_queue.put({"type": "worker_ready", "worker": index, "pid": os.getpid(), "threads": get_thread_layout()})
+
+    stopped = threading.Event()
+
+    def report_stats():
+        while not stopped.wait(STATS_INTERVAL):
+            event_queue.put({
+                "type": "stats",
+                "worker": index,
+                "capture": vps.get_capture_stats(),
+                "reconnect": reconnect_scheduler.snapshot(),
+                "batching": get_batch_stats(),
+                "warmup": get_warmup_reports(),
+                "latency": get_latency_stats(),
+                "models": get_model_load_status(),
+                "swaps": get_swap_reports(),
+                "mode_ready": vps.mode_ready(vps.model_selected)
+            })
+
+    threading.Thread(target=report_stats, daemon=True).start()
+
+    def ack(command, error=None):
+        if "id" in command:
+            event_queue.put({"type": "ack", "id": command["id"], "worker": index, "ok": error is None, "error": error})
+
+    def reload_models(command):
+        try:
+            get_processors()
+        except Exception as e:
+            logger.error(f"[Worker-{index}] Model reload failed: {e}")
+            ack(command, str(e))
+        else:
+            ack(command)
+
+    while True:
+        command = command_queue.get()
+        action = command.get("action")
+        error = None
+        try:
+            if action == "restart":
+                vps.restart_camera_thread(command["camera_id"], command["url"], command.get("options"))
+            elif action == "stop":
+                vps.stop_camera_thread(command["camera_id"])
+            elif action == "model":
+                vps.model_changed(command["value"])
+            elif action == "frame_enhancer":
+                vps.change_frame_enhancer(command["value"])
+            elif action == "reload_models":
+                # Loading takes a while: keep handling commands meanwhile; the reload thread acks when done
+                threading.Thread(target=reload_models, args=(command,), name="model-reload", daemon=True).start()
+                continue
+            elif action == "shutdown":
+                vps.stop_all_processing()
+                break
+        except Exception as e:
+            logger.error(f"[Worker-{index}] Command {action} failed: {e}")
+            error = str(e)
+        ack(command, error)
+
+    stopped.set()
+
+
+class CameraWorkerPool:
+    """Shards cameras across worker processes and relays their events to the web process."""
+
+    def __init__(self):
+        self.workers = []  # index -> {"process", "commands"}
+        self.assignments = {}  # camera_id -> worker index
+        self.cameras = {}  # camera_id -> (url, options), replayed if a worker dies
+        self.stats = {}  # worker index -> last stats report
+        self.thread_layouts = {}  # worker index -> thread budget applied in the worker
+        self.settings = {}
+        self.max_workers = 0
+        self.events = None
+        self.stopping = False
+        self._ctx = multiprocessing.get_context("spawn")
+        self._lock = threading.Lock()
+        self._acks = {}
+        self._ids = itertools.count(1)
+
+    @property
+    def active(self):
+        return bool(self.workers)
+
+    def start(self, num_workers, settings, initial_workers=None):
+        """Start `initial_workers` processes (default all); more are spawned as cameras arrive, up to `num_workers`."""
+        if self.active:
+            return
+        self.max_workers = num_workers
+        # Thread budgets are sized for the full pool, so later workers do not oversubscribe the cores
+        self.settings = dict(settings, processes=num_workers)
+        self.events = self._ctx.Queue(maxsize=EVENT_QUEUE_SIZE)
+        initial = num_workers if initial_workers is None else initial_workers
+        for index in range(max(1, min(num_workers, initial))):
+            self.workers.append(self._spawn(index))
+        threading.Thread(target=self._drain_events, daemon=True).start()
+        threading.Thread(target=self._watchdog, daemon=True).start()
+        atexit.register(self.shutdown)
+        logger.info(f"Started {len(self.workers)} of up to {num_workers} camera worker processes")
+
+    def shutdown(self, timeout=SHUTDOWN_TIMEOUT):
+        """Ask every worker to stop its cameras and exit; workers still running after `timeout` are terminated."""
+        if not self.active or self.stopping:
+            return
+        self.stopping = True
+        for index in range(len(self.workers)):
+            self._send(index, "shutdown")
+        deadline = time.time() + timeout
+        for index, worker in enumerate(self.workers):
+            worker["process"].join(max(0.0, deadline - time.time()))
+            if worker["process"].is_alive():
+                logger.warning(f"[Worker-{index}] Did not stop within {timeout}s; terminating")
+                worker["process"].terminate()
+        logger.info("Camera worker processes stopped")
+
+    def _spawn(self, index):
+        commands = self._ctx.Queue()
+        process = self._ctx.Process(
+            target=worker_main,
+            args=(index, commands, self.events, self.settings),
+            name=f"camera-worker-{index}",
+            daemon=True
+        )
+        process.start()
+        return {"process": process, "commands": commands}
+
+    def _send(self, index, action, wait=False, timeout=COMMAND_TIMEOUT, **payload):
+        ack_id = self._post(index, action, wait, **payload)
+        if ack_id is not None:
+            return self._wait_ack(index, action, ack_id, timeout)
+
+    def _post(self, index, action, ack=False, **payload):
+        """Queue a command for a worker; returns the id to wait on when `ack` is requested."""
+        command = {"action": action, **payload}
+        if ack:
+            command["id"] = next(self._ids)
+            self._acks[command["id"]] = {"event": threading.Event(), "result": None}
+        self.workers[index]["commands"].put(command)
+        return command.get("id")
+
+    def _wait_ack(self, index, action, ack_id, timeout, deadline=None):
+        """Wait up to `timeout` (or until `deadline`) for a command's acknowledgement.
+
+        Returns {"ok", "error"} as reported by the worker.
+        """
+        pending = self._acks[ack_id]
+        try:
+            remaining = timeout if deadline is None else max(0.0, deadline - time.time())
+            if not pending["event"].wait(remaining):
+                logger.warning(f"[Worker-{index}] No acknowledgement for {action} after {timeout:.0f}s")
+                return {"ok": False, "error": f"No acknowledgement after {timeout:.0f}s"}
+            return pending["result"]
+        finally:
+            self._acks.pop(ack_id, None)
+
+    def _shard_for(self, camera_id):
+        with self._lock:
+            if camera_id in self.assignments:
+                return self.assignments[camera_id]
+            loads = [0] * len(self.workers)
+            for index in self.assignments.values():
+                loads[index] += 1
+            if min(loads) > 0 and len(self.workers) < self.max_workers:
+                # Every worker already has cameras: grow the pool before doubling up
+                self.workers.append(self._spawn(len(self.workers)))
+                loads.append(0)
+                logger.info(f"Started camera worker {len(self.workers) - 1} for Camera ID {camera_id}")
+            index = loads.index(min(loads))
+            self.assignments[camera_id] = index
+            return index
+
+    def restart_camera(self, camera_id, url, options=None):
+        index = self._shard_for(camera_id)
+        self.cameras[camera_id] = (url, options)
+        self._send(index, "restart", camera_id=camera_id, url=url, options=options)
+
+    def stop_camera(self, camera_id):
+        with self._lock:
+            index = self.assignments.pop(camera_id, None)
+        self.cameras.pop(camera_id, None)
+        if index is not None:
+            self._send(index, "stop", wait=True, camera_id=camera_id)
+
+    def stop_all(self):
+        for camera_id in list(self.assignments):
+            self.stop_camera(camera_id)
+
+    def broadcast(self, action, wait=False, timeout=COMMAND_TIMEOUT, **payload):
+        """Send a command to every worker; with `wait`, returns {worker index: {"ok", "error"}}.
+
+        All workers get the command before any acknowledgement is awaited, so
+        they run it concurrently and `timeout` bounds the whole broadcast.
+        """
+        if action in ("model", "frame_enhancer"):
+            self.settings[action] = payload.get("value")
+        ack_ids = [(index, self._post(index, action, wait, **payload)) for index in range(len(self.workers))]
+        if not wait:
+            return None
+        deadline = time.time() + timeout
+        return {index: self._wait_ack(index, action, ack_id, timeout, deadline) for index, ack_id in ack_ids}
+
+    def reload_models(self):
+        """Reload the models on every worker at once; returns each worker's result once all have finished."""
+        return self.broadcast("reload_models", wait=True, timeout=RELOAD_TIMEOUT)
+
+    def capture_stats(self):
+        merged = {}
+        for report in list(self.stats.values()):
+            merged.update(report.get("capture", {}))
+        return merged
+
+    def reconnect_status(self):
+        merged = {}
+        for report in list(self.stats.values()):
+            merged.update(report.get("reconnect", {}))
+        return merged
+
+    def batch_stats(self):
+        return {index: report["batching"] for index, report in list(self.stats.items()) if report.get("batching")}
+
+    def swap_reports(self):
+        return {index: report["swaps"] for index, report in list(self.stats.items()) if report.get("swaps")}
+
+    def mode_readiness(self):
+        return {index: report["mode_ready"] for index, report in list(self.stats.items()) if "mode_ready" in report}
+
+    def model_status(self):
+        return {index: report["models"] for index, report in list(self.stats.items()) if "models" in report}
+
+    def latency_stats(self):
+        merged = {}
+        for report in list(self.stats.values()):
+            merged.update(report.get("latency", {}))
+        return merged
+
+    def warmup_reports(self):
+        return {index: report["warmup"] for index, report in list(self.stats.items()) if report.get("warmup")}
+
+    def _drain_events(self):
+        from service.log_notifier_service import emit_ipc_event
+
+        while True:
+            event = self.events.get()
+            kind = event.get("type")
+            if kind == "ack":
+                pending = self._acks.get(event["id"])
+                if pending is not None:
+                    pending["result"] = {"ok": event.get("ok", True), "error": event.get("error")}
+                    pending["event"].set()
+            elif kind == "stats":
+                self.stats[event["worker"]] = event
+            elif kind == "worker_ready":
+                self.thread_layouts[event["worker"]] = event.get("threads")
+                logger.info(f"[Worker-{event['worker']}] Ready (pid {event['pid']})")
+            else:
+                emit_ipc_event(event)
+
+    def _watchdog(self):
+        """Respawn dead workers and hand their cameras back to them."""
+        while True:
+            time.sleep(WATCHDOG_INTERVAL)
+            if self.stopping:
+                return
+            for index, worker in enumerate(list(self.workers)):
+                if worker["process"].is_alive():
+                    continue
+                logger.error(f"[Worker-{index}] Exited with code {worker['process'].exitcode}; respawning")
+                self.stats.pop(index, None)
+                self.workers[index] = self._spawn(index)
+                with self._lock:
+                    cameras = [cam_id for cam_id, shard in self.assignments.items() if shard == index]
+                for camera_id in cameras:
+                    url, options = self.cameras.get(camera_id, (None, None))
+                    if url is not None:
+                        self._send(index, "restart", camera_id=camera_id, url=url, options=options)
+
+
+camera_worker_pool = CameraWorkerPool()
@@ -0,0 +1,76 @@
+import numpy as np
+
+# One row per detection; class names are stored inline so arrays from different models can be concatenated
+DETECTION_DTYPE = np.dtype([
+    ("class", "U24"),
+    ("confidence", np.float32),
+    ("xmin", np.int32),
+    ("ymin", np.int32),
+    ("xmax", np.int32),
+    ("ymax", np.int32)
+])
+
+# Tracker output: a detection plus the persistent id of the track it belongs to
+TRACK_DTYPE = np.dtype(DETECTION_DTYPE.descr + [("track_id", np.int32)])
+
+
+def empty_detections():
+    return np.empty(0, dtype=DETECTION_DTYPE)
+
+
+class LabelFilter:
+    """Precomputed class-id lookup for a model: which ids to keep and their (lower-cased) names."""
+
+    def __init__(self, id2label, keep):
+        keep = {name.lower() for name in keep}
+        size = max((int(k) for k in id2label), default=-1) + 1
+        self.names = np.full(size, "unknown", dtype=DETECTION_DTYPE["class"])
+        self.mask = np.zeros(size, dtype=bool)
+        for class_id, name in id2label.items():
+            self.names[int(class_id)] = name.lower()
+            self.mask[int(class_id)] = name.lower() in keep
+
+    def select(self, result):
+        """Structured detections from one image's post-processed result (scores, labels, boxes tensors)."""
+        scores = result["scores"].detach().cpu().numpy()
+        labels = result["labels"].detach().cpu().numpy()
+        boxes = result["boxes"].detach().cpu().numpy()
+
+        in_range = labels < len(self.mask)
+        keep = np.zeros(len(labels), dtype=bool)
+        keep[in_range] = self.mask[labels[in_range]]
+        keep &= np.isfinite(boxes).all(axis=1)  # Drop NaN/inf boxes
+
+        detections = np.empty(int(keep.sum()), dtype=DETECTION_DTYPE)
+        detections["class"] = self.names[labels[keep]]
+        detections["confidence"] = scores[keep]
+        kept_boxes = boxes[keep].astype(np.int32)  # Truncates like int() did
+        detections["xmin"] = kept_boxes[:, 0]
+        detections["ymin"] = kept_boxes[:, 1]
+        detections["xmax"] = kept_boxes[:, 2]
+        detections["ymax"] = kept_boxes[:, 3]
+        return detections
+
+
+def concat_detections(parts):
+    parts = [part for part in parts if len(part)]
+    return np.concatenate(parts) if parts else empty_detections()
+
+
+def to_dicts(detections, decimals=2):
+    """Plain dicts for JSON, CSV and socket payloads; use only at the API edge."""
+    tracked = "track_id" in (detections.dtype.names or ())
+    rows = []
+    for row in detections:
+        item = {
+            "class": str(row["class"]),
+            "confidence": round(float(row["confidence"]), decimals),
+            "xmin": int(row["xmin"]),
+            "ymin": int(row["ymin"]),
+            "xmax": int(row["xmax"]),
+            "ymax": int(row["ymax"])
+        }
+        if tracked:
+            item["track_id"] = int(row["track_id"])
+        rows.append(item)
+    return rows
@@ -0,0 +1,224 @@
+import logging
+import subprocess
+import threading
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+FFMPEG_BINARY = "ffmpeg"
+FFPROBE_BINARY = "ffprobe"
+DECODER_THREADS = 1
+POOL_SIZE = 4  # >= 3: one slot in the mailbox, one held by the consumer, one being written
+PROBE_TIMEOUT = 15
+KEYFRAME_PROBE_SECONDS = 6
+
+keyframe_intervals = {}  # rtsp_url -> probed seconds between keyframes
+
+
+def probe_frame_size(rtsp_url, timeout=PROBE_TIMEOUT):
+    """Return (width, height) of the first video stream, or None if the stream cannot be probed."""
+    cmd = [
+        FFPROBE_BINARY, "-v", "error",
+        "-rtsp_transport", "tcp",
+        "-select_streams", "v:0",
+        "-show_entries", "stream=width,height",
+        "-of", "csv=s=x:p=0",
+        rtsp_url
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True).stdout
+        width, height = out.strip().splitlines()[0].split("x")[:2]
+        return int(width), int(height)
+    except Exception as e:
+        logger.error(f"ffprobe failed for {rtsp_url}: {e}")
+        return None
+
+
+def probe_keyframe_interval(rtsp_url, seconds=KEYFRAME_PROBE_SECONDS, timeout=PROBE_TIMEOUT):
+    """Median seconds between keyframes over a short window of the stream, or None if unknown.
+
+    Only GOP heads are decoded (-skip_frame nokey), so the probe itself is cheap.
+    Results are cached per URL since the GOP rarely changes between reconnects.
+    """
+    if rtsp_url in keyframe_intervals:
+        return keyframe_intervals[rtsp_url]
+
+    cmd = [
+        FFPROBE_BINARY, "-v", "error",
+        "-rtsp_transport", "tcp",
+        "-select_streams", "v:0",
+        "-skip_frame", "nokey",
+        "-show_entries", "frame=pts_time",
+        "-read_intervals", f"%+{seconds}",
+        "-of", "csv=p=0",
+        rtsp_url
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout, check=True).stdout
+        times = sorted(float(line.strip().strip(",")) for line in out.splitlines()
+                       if line.strip().strip(",") not in ("", "N/A"))
+    except Exception as e:
+        logger.error(f"Keyframe probe failed for {rtsp_url}: {e}")
+        return None
+
+    gaps = np.diff(times)
+    gaps = gaps[gaps > 0]
+    if gaps.size == 0:
+        logger.warning(f"Keyframe probe found fewer than two keyframes in {seconds}s for {rtsp_url}")
+        return None
+
+    interval = float(np.median(gaps))
+    keyframe_intervals[rtsp_url] = interval
+    return interval
+
+
+class FramePool:
+    """Fixed set of preallocated BGR frames shared between the decoder and its consumers.
+
+    A frame is reused only when nobody holds it, so the grabber's mailbox and the
+    processing loop can keep references without copying.
+    """
+
+    def __init__(self, width, height, size=POOL_SIZE):
+        self.buffers = [np.empty((height, width, 3), dtype=np.uint8) for _ in range(size)]
+        self._index = {id(buf): i for i, buf in enumerate(self.buffers)}
+        self._holds = [0] * size
+        self._next = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Return a buffer nobody holds, or None if the pool is exhausted."""
+        with self._lock:
+            for offset in range(len(self.buffers)):
+                i = (self._next + offset) % len(self.buffers)
+                if self._holds[i] == 0:
+                    self._next = (i + 1) % len(self.buffers)
+                    return self.buffers[i]
+        return None
+
+    def hold(self, frame):
+        i = self._index.get(id(frame))
+        if i is not None:
+            with self._lock:
+                self._holds[i] += 1
+
+    def release(self, frame):
+        i = self._index.get(id(frame))
+        if i is not None:
+            with self._lock:
+                self._holds[i] = max(0, self._holds[i] - 1)
+
+
+class FFmpegCapture:
+    """cv2.VideoCapture-like reader that decodes with an ffmpeg subprocess.
+
+    ffmpeg writes rawvideo (bgr24) to a pipe and every frame is `readinto` a
+    buffer from a preallocated FramePool, so steady-state decoding allocates
+    nothing per frame.
+
+    With `keyframes_only` the decoder skips every non-key frame (-skip_frame nokey),
+    which cuts decode cost roughly by the GOP length for low-rate sampling.
+    """
+
+    def __init__(self, rtsp_url, width=None, height=None, threads=DECODER_THREADS, low_delay=True,
+                 pool_size=POOL_SIZE, extra_input_args=None, keyframes_only=False):
+        self.rtsp_url = rtsp_url
+        self.threads = threads
+        self.low_delay = low_delay
+        self.keyframes_only = keyframes_only
+        self.extra_input_args = list(extra_input_args or [])
+        self.proc = None
+        self.pool = None
+        self.scale = None
+
+        if width and height:
+            self.width, self.height = int(width), int(height)
+            self.scale = (self.width, self.height)
+        else:
+            size = probe_frame_size(rtsp_url)
+            if size is None:
+                return
+            self.width, self.height = size
+
+        self.frame_bytes = self.width * self.height * 3
+        self.pool = FramePool(self.width, self.height, size=pool_size)
+        self._spawn()
+
+    def build_command(self):
+        cmd = [FFMPEG_BINARY, "-hide_banner", "-loglevel", "error", "-nostdin", "-rtsp_transport", "tcp"]
+        if self.low_delay:
+            cmd += ["-fflags", "nobuffer", "-flags", "low_delay"]
+        cmd += ["-threads", str(self.threads)]
+        if self.keyframes_only:
+            cmd += ["-skip_frame", "nokey"]
+        cmd += self.extra_input_args
+        cmd += ["-i", self.rtsp_url, "-an", "-sn"]
+        if self.scale:
+            cmd += ["-vf", f"scale={self.scale[0]}:{self.scale[1]}"]
+        if self.keyframes_only:
+            # Pass decoded keyframes through as-is instead of duplicating them to the stream rate
+            cmd += ["-vsync", "0"]
+        cmd += ["-f", "rawvideo", "-pix_fmt", "bgr24", "pipe:1"]
+        return cmd
+
+    def _spawn(self):
+        cmd = self.build_command()
+        try:
+            self.proc = subprocess.Popen(
+                cmd,
+                stdin=subprocess.DEVNULL,
+                stdout=subprocess.PIPE,
+                stderr=subprocess.DEVNULL,
+                bufsize=self.frame_bytes
+            )
+            logger.info(f"Started ffmpeg decoder: {' '.join(cmd)}")
+        except Exception as e:
+            logger.error(f"Failed to start ffmpeg for {self.rtsp_url}: {e}")
+            self.proc = None
+
+    def isOpened(self):
+        return self.proc is not None and self.proc.poll() is None
+
+    def set(self, prop_id, value):
+        # OpenCV capture properties do not apply to the subprocess decoder
+        return False
+
+    def read(self):
+        if not self.isOpened():
+            return False, None
+
+        frame = self.pool.acquire()
+        if frame is None:
+            logger.warning(f"Frame pool exhausted for {self.rtsp_url}; allocating a temporary frame")
+            frame = np.empty((self.height, self.width, 3), dtype=np.uint8)
+
+        view = frame.data.cast("B")
+        filled = 0
+        while filled < self.frame_bytes:
+            n = self.proc.stdout.readinto(view[filled:])
+            if not n:
+                return False, None
+            filled += n
+        return True, frame
+
+    def hold_frame(self, frame):
+        self.pool.hold(frame)
+
+    def release_frame(self, frame):
+        self.pool.release(frame)
+
+    def interrupt(self):
+        """Kill the decoder so a blocking read() returns immediately."""
+        if self.proc is not None and self.proc.poll() is None:
+            self.proc.kill()
+
+    def release(self):
+        if self.proc is None:
+            return
+        self.interrupt()
+        try:
+            self.proc.stdout.close()
+            self.proc.wait(timeout=5)
+        except Exception as e:
+            logger.warning(f"Error while closing ffmpeg decoder: {e}")
+        self.proc = None
@@ -0,0 +1,204 @@
+import logging
+import threading
+import numpy as np
+from multiprocessing import shared_memory
+
+logger = logging.getLogger(__name__)
+
+SLOT_COUNT = 8
+HEADER_FIELDS = 4  # ring header (slots, max h, max w, max c) and per slot (seq, h, w, c), int64
+
+frame_buses = {}  # (camera_id, stream) -> FrameRing
+bus_lock = threading.Lock()
+deferred_closes = []  # SharedMemory handles whose mapping was still viewed when their ring closed
+
+
+def ring_name(camera_id, stream="processed"):
+    return f"vigilnet_cam{camera_id}_{stream}"
+
+
+class FrameRing:
+    """Fixed-slot ring of frames in shared memory, one per camera and stream.
+
+    Layout: one ring header row (slots, max height, max width, max channels),
+    one header row per slot (seq, height, width, channels), then the frame
+    slots. A single producer writes frame number `seq` into slot
+    `seq % slots`; any number of consumers, in any process, attach by name and
+    read slots as zero-copy NumPy views.
+
+    Each slot's seq is set to -1 while it is being written and to the frame's
+    sequence number once complete, so readers can detect torn or overwritten
+    frames with `is_current()`.
+    """
+
+    def __init__(self, name, max_shape=None, slots=SLOT_COUNT, create=False):
+        self.name = name
+        if create:
+            try:
+                stale = shared_memory.SharedMemory(name=name)
+                stale.close()
+                stale.unlink()
+            except FileNotFoundError:
+                pass
+            self.slots = slots
+            self.max_shape = tuple(max_shape)
+            self.shm = shared_memory.SharedMemory(name=name, create=True, size=self._size())
+            ring_header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            ring_header[:] = (slots, *self.max_shape)
+        else:
+            self.shm = shared_memory.SharedMemory(name=name)
+            ring_header = np.ndarray((HEADER_FIELDS,), dtype=np.int64, buffer=self.shm.buf)
+            self.slots = int(ring_header[0])
+            self.max_shape = tuple(int(v) for v in ring_header[1:])
+        self.owner = create
+
+        self.slot_bytes = int(np.prod(self.max_shape))
+        header_bytes = (self.slots + 1) * HEADER_FIELDS * 8
+        # frombuffer holds a buffer export, so the mapping cannot be unmapped under a live view
+        self.header = np.frombuffer(self.shm.buf, dtype=np.int64, count=self.slots * HEADER_FIELDS,
+                                    offset=HEADER_FIELDS * 8).reshape(self.slots, HEADER_FIELDS)
+        self.data = np.frombuffer(self.shm.buf, dtype=np.uint8, count=self.slots * self.slot_bytes,
+                                  offset=header_bytes).reshape(self.slots, self.slot_bytes)
+        if create:
+            self.header[:] = 0
+            self.header[:, 0] = -1
+        self._next_seq = int(self.header[:, 0].max()) + 1
+
+    def _size(self):
+        return (self.slots + 1) * HEADER_FIELDS * 8 + self.slots * int(np.prod(self.max_shape))
+
+    @classmethod
+    def create(cls, name, max_shape, slots=SLOT_COUNT):
+        return cls(name, max_shape=max_shape, slots=slots, create=True)
+
+    @classmethod
+    def attach(cls, name):
+        return cls(name, create=False)
+
+    def fits(self, frame):
+        shape = frame.shape if frame.ndim == 3 else (*frame.shape, 1)
+        return all(dim <= limit for dim, limit in zip(shape, self.max_shape))
+
+    def publish(self, frame):
+        """Copy `frame` into the next slot and return its sequence number (single producer)."""
+        if not self.fits(frame):
+            raise ValueError(f"Frame {frame.shape} does not fit ring slot {self.max_shape}")
+        seq = self._next_seq
+        slot = seq % self.slots
+        height, width = frame.shape[:2]
+        channels = frame.shape[2] if frame.ndim == 3 else 1
+
+        self.header[slot, 0] = -1
+        self.data[slot, :frame.nbytes] = np.ascontiguousarray(frame).reshape(-1)
+        self.header[slot, 1:] = (height, width, channels)
+        self.header[slot, 0] = seq
+        self._next_seq = seq + 1
+        return seq
+
+    # Readers take local references to the header/data views, so a concurrent close() in this process
+    # makes them return "no frame" instead of failing; the mapping stays valid while a view is alive.
+
+    def latest_seq(self):
+        header = self.header
+        return int(header[:, 0].max()) if header is not None else -1
+
+    def read(self, seq):
+        """Zero-copy view of frame `seq`, or None if it was never written, already overwritten or the ring is closed."""
+        header, data = self.header, self.data
+        if header is None or data is None or seq < 0:
+            return None
+        slot = seq % self.slots
+        if header[slot, 0] != seq:
+            return None
+        height, width, channels = (int(v) for v in header[slot, 1:])
+        shape = (height, width, channels) if channels > 1 else (height, width)
+        return data[slot, :height * width * channels].reshape(shape)
+
+    def read_latest(self):
+        """Return (seq, view) of the newest complete frame, or (-1, None)."""
+        seq = self.latest_seq()
+        frame = self.read(seq)
+        return (seq, frame) if frame is not None else (-1, None)
+
+    def is_current(self, seq):
+        """True while the slot still holds frame `seq`; check after using a view to detect overwrites."""
+        header = self.header
+        return header is not None and seq >= 0 and header[seq % self.slots, 0] == seq
+
+    @property
+    def closed(self):
+        return self.data is None
+
+    def close(self):
+        # Views must be dropped before the mapping can be closed
+        self.header = None
+        self.data = None
+        _close_deferred()
+        try:
+            self.shm.close()
+        except BufferError:
+            # A reader in this process still holds a frame view; unmap once it has dropped it
+            deferred_closes.append(self.shm)
+        except Exception as e:
+            logger.warning(f"Error closing frame ring {self.name}: {e}")
+        if self.owner:
+            # The name is removed even while mapped, so the segment cannot leak in /dev/shm
+            try:
+                self.shm.unlink()
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                logger.warning(f"Error unlinking frame ring {self.name}: {e}")
+
+
+def _close_deferred():
+    for shm in list(deferred_closes):
+        try:
+            shm.close()
+        except BufferError:
+            continue
+        except Exception as e:
+            logger.warning(f"Error closing frame ring {shm.name}: {e}")
+        deferred_closes.remove(shm)
+
+
+def publish_frame(camera_id, frame, stream="processed", slots=SLOT_COUNT):
+    """Publish a frame to the camera's ring, (re)creating the ring if the frame or slot count does not fit."""
+    key = (camera_id, stream)
+    with bus_lock:
+        ring = frame_buses.get(key)
+        if ring is None or ring.slots != slots or not ring.fits(frame):
+            if ring is not None:
+                ring.close()
+            shape = frame.shape if frame.ndim == 3 else (*frame.shape, 1)
+            ring = FrameRing.create(ring_name(camera_id, stream), max_shape=shape, slots=slots)
+            frame_buses[key] = ring
+    return ring.publish(frame)
+
+
+def open_consumer_ring(camera_id, stream="processed"):
+    """Ring for reading a camera's frames, published by this or another process; None if not published yet.
+
+    Release it with `close_consumer_ring` when done.
+    """
+    with bus_lock:
+        ring = frame_buses.get((camera_id, stream))
+        if ring is not None:
+            return ring
+    try:
+        return FrameRing.attach(ring_name(camera_id, stream))
+    except FileNotFoundError:
+        return None
+
+
+def close_consumer_ring(ring):
+    # Rings owned by this process are closed by their producer
+    if ring is not None and not ring.owner:
+        ring.close()
+
+
+def close_rings(camera_id):
+    """Unlink every ring this process publishes for the camera."""
+    with bus_lock:
+        for key in [key for key in frame_buses if key[0] == camera_id]:
+            frame_buses.pop(key).close()
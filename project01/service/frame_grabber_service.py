@@ -0,0 +1,140 @@
+import logging
+import threading
+import time
+
+from service.latency_stats_service import record_stage
+
+logger = logging.getLogger(__name__)
+
+
+class FrameGrabber:
+    """Decodes a camera stream on its own thread and keeps only the newest frame.
+
+    The processing loop pulls frames with `latest()` every `sample_interval`
+    seconds. A frame replaced before it was pulled is counted as *skipped* if the
+    consumer was not due yet (intentional sampling), and as *superseded* if the
+    consumer was due but still busy. Slow inference therefore shows up in the
+    superseded count instead of as a stale RTSP buffer.
+
+    Captures that decode into a shared frame pool (see FFmpegCapture) expose
+    `hold_frame` / `release_frame`; the grabber holds the mailbox frame and the
+    frame last handed to the consumer so the decoder never overwrites them.
+    """
+
+    def __init__(self, camera_id, cap, sample_interval=0.0, max_failures=5, retry_delay=1.0):
+        self.camera_id = camera_id
+        self.cap = cap
+        self.sample_interval = sample_interval
+        self.max_failures = max_failures
+        self.retry_delay = retry_delay
+
+        self._condition = threading.Condition()
+        self._stop_event = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+        self._hold = getattr(cap, "hold_frame", None)
+        self._release = getattr(cap, "release_frame", None)
+
+        # Single-slot mailbox
+        self._frame = None
+        self._taken_frame = None
+        self._seq = 0
+        self._taken_seq = 0
+        self._due_at = 0.0  # monotonic time from which the consumer wants its next frame
+
+        self.failed = False
+        self.frames_grabbed = 0
+        self.frames_skipped = 0
+        self.frames_superseded = 0
+        self.frames_taken = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self, timeout=5.0):
+        """Signal the grab thread to exit. The capture is released by the grab thread itself."""
+        self._stop_event.set()
+        with self._condition:
+            self._condition.notify_all()
+        interrupt = getattr(self.cap, "interrupt", None)
+        if interrupt is not None:
+            interrupt()
+        if self._thread.is_alive() and threading.current_thread() is not self._thread:
+            self._thread.join(timeout=timeout)
+
+    def _publish(self, frame):
+        if self._hold is not None:
+            self._hold(frame)
+        with self._condition:
+            if self._seq != self._taken_seq:
+                if time.monotonic() < self._due_at:
+                    self.frames_skipped += 1
+                else:
+                    self.frames_superseded += 1
+                if self._release is not None:
+                    self._release(self._frame)
+            self._frame = frame
+            self._seq += 1
+            self.frames_grabbed += 1
+            self._condition.notify_all()
+
+    def _run(self):
+        failures = 0
+        try:
+            while not self._stop_event.is_set():
+                read_started = time.perf_counter()
+                ret, frame = self.cap.read()
+                # Includes waiting for the stream, so at steady state this tracks the camera's frame interval
+                record_stage(self.camera_id, "read", time.perf_counter() - read_started)
+                if not ret or frame is None:
+                    if self._stop_event.is_set():
+                        break
+                    if not self.cap.isOpened():
+                        logger.warning(f"[Grabber-{self.camera_id}] Capture closed by the decoder")
+                        self.failed = True
+                        break
+                    failures += 1
+                    logger.warning(f"[Grabber-{self.camera_id}] No frame received ({failures}/{self.max_failures})")
+                    if failures >= self.max_failures:
+                        self.failed = True
+                        break
+                    self._stop_event.wait(self.retry_delay)
+                    continue
+
+                failures = 0
+                self._publish(frame)
+        except Exception as e:
+            logger.error(f"[Grabber-{self.camera_id}] Capture thread crashed: {e}")
+            self.failed = True
+        finally:
+            with self._condition:
+                self._condition.notify_all()
+            self.cap.release()
+
+    def latest(self, timeout=1.0):
+        """Return the newest frame that has not been handed out yet, or None on timeout/failure."""
+        with self._condition:
+            self._condition.wait_for(
+                lambda: self._seq != self._taken_seq or self.failed or self._stop_event.is_set(),
+                timeout=timeout
+            )
+            if self._seq == self._taken_seq:
+                return None
+            if self._release is not None and self._taken_frame is not None:
+                self._release(self._taken_frame)
+            self._taken_seq = self._seq
+            self._taken_frame = self._frame
+            self._due_at = time.monotonic() + self.sample_interval
+            self.frames_taken += 1
+            return self._frame
+
+    def stats(self):
+        with self._condition:
+            return {
+                "frames_grabbed": self.frames_grabbed,
+                "frames_processed": self.frames_taken,
+                "frames_skipped": self.frames_skipped,  # not wanted by the sampling rate
+                "frames_superseded": self.frames_superseded,  # wanted, but processing was still busy
+                "failed": self.failed
+            }
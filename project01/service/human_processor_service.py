@@ -1,65 +1,63 @@
 import os
 import time
 import cv2
-from transformers import AutoImageProcessor, AutoModelForObjectDetection
+from transformers import AutoImageProcessor
 import torch
+from service.onnx_runtime_service import load_detector
+from service.quantization_service import quantize_model
+from service.model_warmup_service import compile_model
+from service.preprocessing_service import build_preprocessor
+from service.detection_array_service import LabelFilter
 
 class RTDETRProcessor:
     def __init__(self,
                  model_name=None,
-                 confidence_threshold=0.45):
+                 confidence_threshold=0.45,
+                 backend="torch",
+                 quantization="none"):
         self.model_name = model_name
         self.confidence_threshold = confidence_threshold
 
         # ✅ Initialize once
         self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
         self.processor = AutoImageProcessor.from_pretrained(self.model_name)
-        self.model = AutoModelForObjectDetection.from_pretrained(self.model_name)
+        self.preprocessor = build_preprocessor(self.processor)
+        self.model, self.backend = load_detector(self.model_name, backend)
 
-        if any(param.is_meta for param in self.model.parameters()):
+        if self.backend == "onnx":
+            self.device = torch.device("cpu")  # ONNX Runtime session runs on the CPU provider
+        elif any(param.is_meta for param in self.model.parameters()):
             self.model.to_empty(device=self.device)
+            self.model.eval()
         else:
             self.model.to(self.device)
-
-        self.model.eval()
+            self.model.eval()
+        self.quantization = quantization
+        self.model = quantize_model(self.model, quantization, self.device, name=self.model_name)
+        self.model = compile_model(self.model, ("logits", "pred_boxes"), name=self.model_name)
+        # Only detect "person"
+        self.label_filter = LabelFilter(self.model.config.id2label, keep=("person",))
 
     def get_detections(self, frame):
-        rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        inputs = self.processor(images=rgb, return_tensors="pt")
+        return self.get_detections_batch([frame])[0]
+
+    def get_detections_batch(self, frames):
+        """Run one forward pass over several frames and return a structured detection array per frame."""
+        if self.preprocessor is not None:
+            inputs = self.preprocessor(frames)  # Reads the BGR frames directly
+        else:
+            rgbs = [cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames]
+            inputs = self.processor(images=rgbs, return_tensors="pt")
         inputs = {k: v.to(self.device) for k, v in inputs.items()}
 
         with torch.no_grad():
             outputs = self.model(**inputs)
 
-        height, width = frame.shape[:2]
-        target_sizes = torch.tensor([[height, width]], device=self.device)
+        target_sizes = torch.tensor([frame.shape[:2] for frame in frames], device=self.device)
 
-        results = self.processor.post_process_object_detection(
+        batch_results = self.processor.post_process_object_detection(
             outputs, target_sizes=target_sizes, threshold=self.confidence_threshold
-        )[0]
-
-        detections = []
-        for score, label, box in zip(results["scores"], results["labels"], results["boxes"]):
-            class_name = self.model.config.id2label[label.item()]
-
-            # Only detect "person"
-            if class_name.lower() != "person":
-                continue
-
-            # ✅ NaN-safe conversion
-            box_list = box.tolist()
-            if any(coord != coord for coord in box_list):  # NaN check
-                print(f"⚠️ Skipping invalid box: {box_list}")
-                continue
-
-            xmin, ymin, xmax, ymax = [int(coord) for coord in box_list]
-            detections.append({
-                "class": class_name,
-                "confidence": round(score.item(), 2),
-                "xmin": xmin,
-                "ymin": ymin,
-                "xmax": xmax,
-                "ymax": ymax
-            })
+        )
 
-        return detections
+        # Person-only, NaN-safe filtering on whole tensors; one structured array per frame
+        return [self.label_filter.select(results) for results in batch_results]
@@ -0,0 +1,114 @@
+import bisect
+import os
+import time
+
+LATENCY_WINDOW_S = float(os.environ.get("VIGILNET_LATENCY_WINDOW_S", "60"))  # percentiles cover the last 1-2 windows
+# Log-spaced bucket upper bounds in milliseconds, 0.05 ms .. ~80 s, ~12% apart (relative error of a percentile)
+BUCKET_BOUNDS_MS = [0.05 * 1.12 ** i for i in range(126)]
+PERCENTILES = (50, 95, 99)
+
+
+class LatencyHistogram:
+    """Fixed-size rolling latency histogram of one pipeline stage.
+
+    Samples fall into log-spaced buckets, so memory does not grow with the
+    frame rate and recording is one bisect and one increment. Two windows are
+    kept: the current one and the one before it; percentiles are read from
+    both, so they always cover between one and two windows of recent samples.
+    """
+
+    def __init__(self, window=LATENCY_WINDOW_S):
+        self.window = window
+        self.current = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.previous = [0] * (len(BUCKET_BOUNDS_MS) + 1)
+        self.window_started = time.monotonic()
+        self.total = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def _rotate(self, now):
+        if now - self.window_started < self.window:
+            return
+        # A gap of more than two windows leaves nothing recent in either
+        self.previous = self.current if now - self.window_started < 2 * self.window else [0] * len(self.current)
+        self.current = [0] * len(self.current)
+        self.window_started = now
+
+    def record(self, seconds):
+        elapsed_ms = seconds * 1000.0
+        self._rotate(time.monotonic())
+        self.current[bisect.bisect_left(BUCKET_BOUNDS_MS, elapsed_ms)] += 1
+        self.total += 1
+        self.total_ms += elapsed_ms
+        if elapsed_ms > self.max_ms:
+            self.max_ms = elapsed_ms
+
+    def snapshot(self):
+        self._rotate(time.monotonic())
+        counts = [a + b for a, b in zip(self.current, self.previous)]
+        recent = sum(counts)
+        report = {
+            "samples": recent,
+            "total_samples": self.total,
+            "total_mean_ms": round(self.total_ms / self.total, 3) if self.total else None,
+            "total_max_ms": round(self.max_ms, 3)
+        }
+        for percentile in PERCENTILES:
+            report[f"p{percentile}_ms"] = self._percentile(counts, recent, percentile)
+        return report
+
+    @staticmethod
+    def _percentile(counts, recent, percentile):
+        if not recent:
+            return None
+        rank = recent * percentile / 100.0
+        seen = 0
+        for index, count in enumerate(counts):
+            seen += count
+            if seen >= rank:
+                return round(BUCKET_BOUNDS_MS[min(index, len(BUCKET_BOUNDS_MS) - 1)], 3)
+        return round(BUCKET_BOUNDS_MS[-1], 3)
+
+
+camera_latency = {}  # camera_id -> {stage: LatencyHistogram}
+
+
+def record_stage(camera_id, stage, seconds):
+    stages = camera_latency.get(camera_id)
+    if stages is None:
+        stages = camera_latency.setdefault(camera_id, {})
+    histogram = stages.get(stage)
+    if histogram is None:
+        histogram = stages.setdefault(stage, LatencyHistogram())
+    histogram.record(seconds)
+
+
+class timed:
+    """`with timed(camera_id, "stage"):` records the block's wall time for that camera and stage."""
+
+    __slots__ = ("camera_id", "stage", "started")
+
+    def __init__(self, camera_id, stage):
+        self.camera_id = camera_id
+        self.stage = stage
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        record_stage(self.camera_id, self.stage, time.perf_counter() - self.started)
+        return False
+
+
+def get_latency_stats(camera_id=None):
+    """Per-stage latency percentiles, keyed by camera id then stage."""
+    cameras = [camera_id] if camera_id is not None else list(camera_latency)
+    return {
+        cam_id: {stage: histogram.snapshot() for stage, histogram in list(camera_latency[cam_id].items())}
+        for cam_id in cameras if cam_id in camera_latency
+    }
+
+
+def forget_camera(camera_id):
+    camera_latency.pop(camera_id, None)
@@ -1,12 +1,43 @@
 # service/log_notifier.py
+import queue
 import cv2
 
 socketio_instance = None
+ipc_queue = None  # Set inside camera worker processes; emits are forwarded to the web process
 
 def init_notifier(socketio):
     global socketio_instance
     socketio_instance = socketio
 
+def init_ipc_notifier(event_queue):
+    """Forward every emit through a multiprocessing queue instead of Socket.IO."""
+    global ipc_queue
+    ipc_queue = event_queue
+
+def forward_event(event, drop_if_full=False):
+    try:
+        if drop_if_full:
+            ipc_queue.put_nowait(event)
+        else:
+            ipc_queue.put(event)
+    except queue.Full:
+        pass
+
+def emit_ipc_event(event):
+    """Re-emit an event forwarded by a camera worker process (runs in the web process)."""
+    kind = event.get("type")
+    if kind == "log":
+        emit_log_event(event["log"])
+    elif kind == "recording_event":
+        emit_recording_event(event["camera_id"], event["status"])
+    elif kind == "camera_status":
+        emit_camera_status(event["camera_id"], event["status"])
+    elif kind == "frame" and socketio_instance:
+        socketio_instance.emit('frame', {
+            'camera_id': event["camera_id"],
+            'image': event["image"]
+        }, namespace='/cameras')
+
 def emit_from_queue(emit_queue):
     while True:
         log = emit_queue.get()
@@ -15,6 +46,9 @@ def emit_from_queue(emit_queue):
 
 # ✅ New helper for recording events
 def emit_recording_event(camera_id, status):
+    if ipc_queue is not None:
+        forward_event({"type": "recording_event", "camera_id": camera_id, "status": status})
+        return
     if socketio_instance:
         socketio_instance.emit('recording_event', {
             "camera_id": camera_id,
@@ -22,6 +56,9 @@ def emit_recording_event(camera_id, status):
         }, namespace='/recordings')
 
 def emit_camera_status(camera_id, status):
+    if ipc_queue is not None:
+        forward_event({"type": "camera_status", "camera_id": camera_id, "status": status})
+        return
     if socketio_instance:
         socketio_instance.emit('camera_status', {
             "camera_id": camera_id,
@@ -29,12 +66,21 @@ def emit_camera_status(camera_id, status):
         }, namespace='/cameras')
 
 def emit_log_event(log):
+    if ipc_queue is not None:
+        forward_event({"type": "log", "log": log})
+        return
     if socketio_instance:
         socketio_instance.emit('new_log', log, namespace='/logs')
 
 from base64 import b64encode
 
 def emit_frame(camera_id, frame):
+    if ipc_queue is not None:
+        # Frames cross the process boundary already JPEG-encoded; drop them rather than block capture
+        _, buffer = cv2.imencode(".jpg", frame)
+        forward_event({"type": "frame", "camera_id": camera_id, "image": b64encode(buffer).decode("utf-8")},
+                      drop_if_full=True)
+        return
     if socketio_instance:
         _, buffer = cv2.imencode(".jpg", frame)
         b64 = b64encode(buffer).decode("utf-8")
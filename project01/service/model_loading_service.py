@@ -0,0 +1,77 @@
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+MODEL_STATES = ("pending", "loading", "warming", "ready", "failed")
+
+model_load_status = {}  # model name -> state and timings of its latest load
+status_lock = threading.Lock()
+
+
+def mark_model(name, state, error=None):
+    """Record a load-state transition of a model, timing the loading and warm-up phases."""
+    now = time.time()
+    with status_lock:
+        status = model_load_status.get(name)
+        if status is None or (state in ("pending", "loading") and status["state"] in ("ready", "failed")):
+            status = model_load_status[name] = {"state": "pending", "since": now}
+        if state == "loading":
+            status["load_started"] = now
+        elif state == "warming" and "load_started" in status:
+            status["load_s"] = round(now - status["load_started"], 3)
+            status["warmup_started"] = now
+        elif state in ("ready", "failed") and "load_started" in status:
+            if "warmup_started" in status:
+                status["warmup_s"] = round(now - status["warmup_started"], 3)
+            elif state == "ready":
+                status["load_s"] = round(now - status["load_started"], 3)
+            status["total_s"] = round(now - status["load_started"], 3)
+        status["state"] = state
+        status["since"] = now
+        if error is not None:
+            status["error"] = error
+    logger.info(f"Model {name}: {state}" + (f" ({error})" if error else ""))
+
+
+def load_model(name, load, warm=None):
+    """Load one model (and warm it up) while tracking its state; returns what `load()` returned."""
+    mark_model(name, "loading")
+    try:
+        model = load()
+        if warm is not None:
+            mark_model(name, "warming")
+            warm(model)
+    except Exception as e:
+        mark_model(name, "failed", error=str(e))
+        raise
+    mark_model(name, "ready")
+    return model
+
+
+def load_models(loaders):
+    """Run `{name: (load, warm)}` loaders concurrently so disk reads and deserialization overlap.
+
+    Safetensors/torch loading releases the GIL for most of its work, so threads
+    are enough. Every loader runs to completion; the first failure is re-raised
+    afterwards. Returns `{name: model}`.
+    """
+    for name in loaders:
+        mark_model(name, "pending")
+    with ThreadPoolExecutor(max_workers=max(1, len(loaders)), thread_name_prefix="model-load") as executor:
+        futures = {name: executor.submit(load_model, name, load, warm) for name, (load, warm) in loaders.items()}
+    errors = [future.exception() for future in futures.values() if future.exception() is not None]
+    if errors:
+        raise errors[0]
+    return {name: future.result() for name, future in futures.items()}
+
+
+def get_model_load_status():
+    """Load state of every model this process knows about, with load and warm-up timings in seconds."""
+    with status_lock:
+        return {
+            name: {key: value for key, value in status.items() if key not in ("load_started", "warmup_started")}
+            for name, status in model_load_status.items()
+        }
@@ -0,0 +1,142 @@
+import logging
+import os
+import threading
+import time
+from collections import Counter
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# "none" runs eager PyTorch, "trace" uses TorchScript graphs per input shape, "compile" uses torch.compile
+COMPILE_MODE = os.environ.get("VIGILNET_COMPILE", "none")
+COMPILE_MODES = ("none", "trace", "compile")
+MAX_TRACED_SHAPES = 8  # beyond this, unseen shapes run eagerly instead of growing the cache
+WARMUP_ITERATIONS = int(os.environ.get("VIGILNET_WARMUP_ITERATIONS", "3"))
+WARMUP_FRAME_SHAPE = (720, 1280, 3)  # stands in for cameras without a configured inference size
+
+warmup_reports = {}  # model name -> compile/warm-up timings of the last load
+report_lock = threading.Lock()
+camera_frame_shapes = {}  # camera_id -> frame shape reaching the detectors, None if not configured
+
+
+class CompiledModel:
+    """Fixed-shape compiled execution of an HF model, called like the model itself.
+
+    In "trace" mode a TorchScript graph is traced for each distinct set of input
+    shapes (a camera's frame size and the batch size fix them), and the result
+    is exposed through `output_names` so the processor's post-processing keeps
+    working. In "compile" mode torch.compile specialises on shapes in the same way.
+    Anything else (config, parameters) is delegated to the wrapped model.
+    """
+
+    def __init__(self, model, output_names, mode=COMPILE_MODE, name="model"):
+        self.model = model
+        self.output_names = tuple(output_names)
+        self.mode = mode
+        self.name = name
+        self._traced = {}
+        self._lock = threading.Lock()
+        self._compiled = torch.compile(model, dynamic=False) if mode == "compile" else None
+
+    def __getattr__(self, attr):
+        return getattr(self.__dict__["model"], attr)
+
+    def _graph_for(self, inputs):
+        key = tuple((name, tuple(value.shape)) for name, value in inputs.items())
+        graph = self._traced.get(key)
+        if graph is not None:
+            return graph
+        with self._lock:
+            graph = self._traced.get(key)
+            if graph is None and len(self._traced) < MAX_TRACED_SHAPES:
+                names = list(inputs)
+
+                def forward(*args):
+                    outputs = self.model(**dict(zip(names, args)))
+                    return tuple(getattr(outputs, name) for name in self.output_names)
+
+                started = time.time()
+                with torch.no_grad():
+                    graph = torch.jit.trace(forward, tuple(inputs.values()), strict=False, check_trace=False)
+                self._traced[key] = graph
+                logger.info(f"Traced {self.name} for input shapes {key} in {time.time() - started:.2f}s")
+        return graph
+
+    def __call__(self, **inputs):
+        if self._compiled is not None:
+            return self._compiled(**inputs)
+        graph = self._graph_for(inputs)
+        if graph is None:
+            return self.model(**inputs)
+        return SimpleNamespace(**dict(zip(self.output_names, graph(*inputs.values()))))
+
+
+def compile_model(model, output_names, mode=COMPILE_MODE, name="model"):
+    """Wrap a PyTorch model for the configured compile mode; other models are returned unchanged."""
+    if mode not in COMPILE_MODES:
+        raise ValueError(f"Unknown compile mode '{mode}'. Expected one of {COMPILE_MODES}")
+    if mode == "none" or not isinstance(model, torch.nn.Module):
+        return model
+    return CompiledModel(model, output_names, mode=mode, name=name)
+
+
+def register_frame_shape(camera_id, inference_size):
+    """Remember the frame size a camera feeds the detectors, (width, height) or None for its native size."""
+    camera_frame_shapes[camera_id] = (inference_size[1], inference_size[0], 3) if inference_size else None
+
+
+def forget_frame_shape(camera_id):
+    camera_frame_shapes.pop(camera_id, None)
+
+
+def warmup_frame_shapes(batch_sizes=(1,)):
+    """Distinct configured camera frame shapes, most used first, capped so every (shape, batch size) pair
+    still gets a traced graph within MAX_TRACED_SHAPES."""
+    counts = Counter(camera_frame_shapes.values())
+    shapes = [shape for shape, _ in counts.most_common() if shape is not None]
+    if (None in counts or not shapes) and WARMUP_FRAME_SHAPE not in shapes:
+        shapes.append(WARMUP_FRAME_SHAPE)
+    return shapes[:max(1, MAX_TRACED_SHAPES // max(1, len(batch_sizes)))]
+
+
+def warm_up(name, run_batch, batch_sizes=(1,), frame_shapes=None, iterations=WARMUP_ITERATIONS):
+    """Run dummy batches through `run_batch(frames)` for each frame shape and record how long it took.
+
+    Shapes default to the cameras' configured inference sizes. The first call
+    of each shape and batch size includes tracing/compilation and kernel
+    selection; the last one is the steady-state latency.
+    """
+    started = time.time()
+    first_call = {}
+    steady = {}
+    for frame_shape in frame_shapes or warmup_frame_shapes(batch_sizes):
+        frame = np.random.randint(0, 256, frame_shape, dtype=np.uint8)
+        for batch_size in batch_sizes:
+            key = f"{frame_shape[0]}x{frame_shape[1]}/{batch_size}"
+            frames = [frame] * batch_size
+            for iteration in range(max(1, iterations)):
+                call_started = time.time()
+                run_batch(frames)
+                elapsed = time.time() - call_started
+                if iteration == 0:
+                    first_call[key] = round(elapsed, 3)
+            steady[key] = round(1000 * elapsed, 1)
+
+    report = {
+        "compile_mode": COMPILE_MODE,
+        "first_call_s": first_call,
+        "steady_ms": steady,
+        "warmup_s": round(time.time() - started, 3)
+    }
+    with report_lock:
+        warmup_reports[name] = report
+    logger.info(f"Warmed up {name} in {report['warmup_s']}s (first call {first_call}s, steady {steady}ms)")
+    return report
+
+
+def get_warmup_reports():
+    with report_lock:
+        return dict(warmup_reports)
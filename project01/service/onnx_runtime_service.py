@@ -0,0 +1,175 @@
+import inspect
+import json
+import logging
+import os
+from types import SimpleNamespace
+
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+ONNX_SUBDIR = "onnx"
+ONNX_FILENAME = "model.onnx"
+ONNX_OPSET = 17
+EXPORT_SAMPLE_SIZE = (640, 640)
+# Largest max-abs difference from PyTorch an export may have; larger ones are deleted instead of served
+EXPORT_TOLERANCE = float(os.environ.get("VIGILNET_ONNX_TOLERANCE", "1e-3"))
+ANIMAL_DETECTOR_PATH = "modelRepository/detr-resn/default"
+
+
+def onnx_path(model_dir):
+    """Location of a checkpoint's exported ONNX graph, next to its weights."""
+    return os.path.join(model_dir, ONNX_SUBDIR, ONNX_FILENAME)
+
+
+def has_onnx_export(model_dir):
+    return os.path.exists(onnx_path(model_dir))
+
+
+class _DetectorExportWrapper(torch.nn.Module):
+    """Exposes only the tensors post_process_object_detection needs (logits, pred_boxes)."""
+
+    def __init__(self, model, use_pixel_mask):
+        super().__init__()
+        self.model = model
+        self.use_pixel_mask = use_pixel_mask
+
+    def forward(self, pixel_values, pixel_mask=None):
+        if self.use_pixel_mask:
+            outputs = self.model(pixel_values=pixel_values, pixel_mask=pixel_mask)
+        else:
+            outputs = self.model(pixel_values=pixel_values)
+        return outputs.logits, outputs.pred_boxes
+
+
+def export_detector(model_dir, output_path=None, opset=ONNX_OPSET, tolerance=EXPORT_TOLERANCE):
+    """Export an object-detection checkpoint to ONNX with dynamic batch and image size.
+
+    Returns the output path and the max absolute difference between the
+    PyTorch and ONNX Runtime outputs on a sample input. If that difference
+    exceeds `tolerance` the export is deleted and ValueError is raised, so
+    load_detector() never picks up a graph that disagrees with PyTorch.
+    """
+    from transformers import AutoModelForObjectDetection
+
+    output_path = output_path or onnx_path(model_dir)
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+
+    model = AutoModelForObjectDetection.from_pretrained(model_dir).eval()
+    # DETR-style models take a padding mask; RT-DETR does not
+    use_pixel_mask = "pixel_mask" in inspect.signature(model.forward).parameters
+    wrapper = _DetectorExportWrapper(model, use_pixel_mask)
+
+    height, width = EXPORT_SAMPLE_SIZE
+    pixel_values = torch.randn(1, 3, height, width)
+    args = (pixel_values,)
+    input_names = ["pixel_values"]
+    dynamic_axes = {
+        "pixel_values": {0: "batch", 2: "height", 3: "width"},
+        "logits": {0: "batch"},
+        "pred_boxes": {0: "batch"}
+    }
+    if use_pixel_mask:
+        args = (pixel_values, torch.ones(1, height, width, dtype=torch.int64))
+        input_names.append("pixel_mask")
+        dynamic_axes["pixel_mask"] = {0: "batch", 1: "height", 2: "width"}
+
+    with torch.no_grad():
+        torch.onnx.export(
+            wrapper, args, output_path,
+            input_names=input_names,
+            output_names=["logits", "pred_boxes"],
+            dynamic_axes=dynamic_axes,
+            opset_version=opset,
+            do_constant_folding=True
+        )
+        expected = wrapper(*args)
+
+    session = OnnxDetector(model_dir, onnx_file=output_path)
+    actual = session(**dict(zip(input_names, args)))
+    max_diff = max(
+        float((expected[0] - actual.logits).abs().max()),
+        float((expected[1] - actual.pred_boxes).abs().max())
+    )
+    if max_diff > tolerance:
+        del session
+        os.remove(output_path)
+        raise ValueError(f"ONNX export of {model_dir} differs from PyTorch by {max_diff:.2e} "
+                         f"(tolerance {tolerance:.0e}); export removed")
+    logger.info(f"Exported {model_dir} to {output_path} (max abs diff vs PyTorch: {max_diff:.2e})")
+    return output_path, max_diff
+
+
+class OnnxDetector:
+    """ONNX Runtime session that stands in for an AutoModelForObjectDetection.
+
+    Called with the processor's tensors, it returns an object with `logits` and
+    `pred_boxes` so the HF image processor's post-processing runs unchanged.
+    """
+
+    def __init__(self, model_dir, onnx_file=None):
+        import onnxruntime as ort
+        from transformers import AutoConfig
+
+        self.model_dir = model_dir
+        self.onnx_file = onnx_file or onnx_path(model_dir)
+        if not os.path.exists(self.onnx_file):
+            raise FileNotFoundError(
+                f"No ONNX export at {self.onnx_file}; run `python project01/service/onnx_runtime_service.py`"
+            )
+        self.config = AutoConfig.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        # Stay inside the process's thread budget instead of spinning up a pool per core
+        options.intra_op_num_threads = torch.get_num_threads()
+        options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(self.onnx_file, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self.input_names = [node.name for node in self.session.get_inputs()]
+
+    def __call__(self, **inputs):
+        feed = {}
+        for name in self.input_names:
+            if name == "pixel_mask" and name not in inputs:
+                # Unpadded inputs come without a mask; the PyTorch models then attend to every pixel
+                batch, _, height, width = inputs["pixel_values"].shape
+                feed[name] = np.ones((batch, height, width), dtype=np.int64)
+                continue
+            value = inputs[name]
+            value = value.cpu().numpy() if isinstance(value, torch.Tensor) else np.asarray(value)
+            feed[name] = value.astype(np.float32 if name == "pixel_values" else np.int64, copy=False)
+        logits, pred_boxes = self.session.run(["logits", "pred_boxes"], feed)
+        return SimpleNamespace(logits=torch.from_numpy(logits), pred_boxes=torch.from_numpy(pred_boxes))
+
+
+def load_detector(model_dir, backend="torch"):
+    """Load a detector for the requested backend; falls back to PyTorch if no ONNX export exists."""
+    from transformers import AutoModelForObjectDetection
+
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend '{backend}'. Expected one of {BACKENDS}")
+    if backend == "onnx":
+        if has_onnx_export(model_dir):
+            logger.info(f"Serving {model_dir} with ONNX Runtime")
+            return OnnxDetector(model_dir), "onnx"
+        logger.warning(f"ONNX backend requested for {model_dir} but no export found; using PyTorch")
+    return AutoModelForObjectDetection.from_pretrained(model_dir), "torch"
+
+
+if __name__ == "__main__":
+    # Run from the repository root: python project01/service/onnx_runtime_service.py
+    logging.basicConfig(level=logging.INFO)
+    with open("modelRepository/modelUsageStatus.json", "r") as f:
+        status = json.load(f)
+    # The animal pipeline's detector is DETR; its DINO classifier stays on PyTorch
+    for path in (status.get("humanModelPath", ""), ANIMAL_DETECTOR_PATH):
+        if not path or not os.path.isdir(path):
+            logger.warning(f"Skipping export: {path!r} is not a model directory")
+            continue
+        try:
+            export_detector(path)
+        except ValueError as e:
+            logger.error(str(e))
@@ -0,0 +1,160 @@
+import logging
+import os
+import threading
+
+import cv2
+import numpy as np
+import torch
+
+logger = logging.getLogger(__name__)
+
+# "0" falls back to the HF image processors (PIL resize, per-call allocations)
+FAST_PREPROCESSING = os.environ.get("VIGILNET_FAST_PREPROCESS", "1") == "1"
+
+# PIL resample codes used in preprocessor_config.json -> OpenCV interpolation when upscaling.
+# PIL filters antialias when downscaling; INTER_AREA is OpenCV's equivalent.
+PIL_TO_CV2 = {
+    0: cv2.INTER_NEAREST,
+    1: cv2.INTER_LANCZOS4,
+    2: cv2.INTER_LINEAR,
+    3: cv2.INTER_CUBIC,
+    4: cv2.INTER_LINEAR,
+    5: cv2.INTER_CUBIC
+}
+SUPPORTED_PROCESSORS = ("DetrImageProcessor", "RTDetrImageProcessor", "BitImageProcessor", "DPTImageProcessor")
+
+
+def _constrain_to_multiple_of(value, multiple):
+    return round(value / multiple) * multiple
+
+
+class FastImagePreprocessor:
+    """NumPy/OpenCV replacement for an HF image processor on BGR camera frames.
+
+    Reads size, resample, rescale, mean/std, center crop and padding from the
+    loaded processor and does resize -> crop -> normalise -> CHW in one pass per
+    frame, written straight into a reused (per-thread) batch buffer. The BGR->RGB
+    swap is folded into the channel transpose, so every model reads the same
+    camera frame and no colour-converted copy is made.
+    """
+
+    def __init__(self, hf_processor):
+        self.kind = type(hf_processor).__name__
+        self.size = dict(hf_processor.size or {})
+        self.resample = int(getattr(hf_processor, "resample", 2))
+        self.do_resize = getattr(hf_processor, "do_resize", True)
+        self.do_center_crop = getattr(hf_processor, "do_center_crop", False)
+        self.crop_size = dict(getattr(hf_processor, "crop_size", None) or {})
+        self.keep_aspect_ratio = getattr(hf_processor, "keep_aspect_ratio", False)
+        self.ensure_multiple_of = getattr(hf_processor, "ensure_multiple_of", 1) or 1
+        # Like the HF processor, a mask is only returned when padding (DETR); RT-DETR lists it but does not pad
+        self.with_pixel_mask = ("pixel_mask" in getattr(hf_processor, "model_input_names", ())
+                                and getattr(hf_processor, "do_pad", False))
+
+        scale = hf_processor.rescale_factor if getattr(hf_processor, "do_rescale", True) else 1.0
+        if getattr(hf_processor, "do_normalize", False):
+            mean = np.asarray(hf_processor.image_mean, dtype=np.float32)
+            std = np.asarray(hf_processor.image_std, dtype=np.float32)
+            self.multiplier = (scale / std).reshape(3, 1, 1).astype(np.float32)
+            self.offset = (-mean / std).reshape(3, 1, 1).astype(np.float32)
+        else:
+            self.multiplier = np.full((3, 1, 1), scale, dtype=np.float32)
+            self.offset = np.zeros((3, 1, 1), dtype=np.float32)
+        self._local = threading.local()
+
+    def output_size(self, height, width):
+        """(height, width) the HF processor would resize a height x width image to."""
+        size = self.size
+        if "shortest_edge" in size and "longest_edge" in size:
+            # DETR: shortest edge to `shortest_edge` unless the longest edge would exceed `longest_edge`
+            target, max_size = size["shortest_edge"], size["longest_edge"]
+            raw_size = None
+            short, long = float(min(height, width)), float(max(height, width))
+            if long / short * target > max_size:
+                raw_size = max_size * short / long
+                target = int(round(raw_size))
+            if (height <= width and height == target) or (width <= height and width == target):
+                return height, width
+            if width < height:
+                return int((raw_size or target) * height / width), target
+            return target, int((raw_size or target) * width / height)
+        if "shortest_edge" in size:
+            target = size["shortest_edge"]
+            if width <= height:
+                return int(target * height / width), target
+            return target, int(target * width / height)
+        out_height, out_width = size["height"], size["width"]
+        if not self.keep_aspect_ratio and self.ensure_multiple_of == 1:
+            return out_height, out_width
+        # DPT: keep the aspect ratio of the side closest to its target, snap to a multiple
+        scale_height, scale_width = out_height / height, out_width / width
+        if self.keep_aspect_ratio:
+            if abs(1 - scale_width) < abs(1 - scale_height):
+                scale_height = scale_width
+            else:
+                scale_width = scale_height
+        return (_constrain_to_multiple_of(scale_height * height, self.ensure_multiple_of),
+                _constrain_to_multiple_of(scale_width * width, self.ensure_multiple_of))
+
+    def _resize(self, frame):
+        height, width = frame.shape[:2]
+        out_height, out_width = self.output_size(height, width) if self.do_resize else (height, width)
+        if (out_height, out_width) != (height, width):
+            shrinking = out_height * out_width < height * width
+            interpolation = cv2.INTER_AREA if shrinking else PIL_TO_CV2.get(self.resample, cv2.INTER_LINEAR)
+            frame = cv2.resize(frame, (out_width, out_height), interpolation=interpolation)
+        if self.do_center_crop and self.crop_size:
+            crop_height, crop_width = self.crop_size["height"], self.crop_size["width"]
+            top = max(0, (frame.shape[0] - crop_height) // 2)
+            left = max(0, (frame.shape[1] - crop_width) // 2)
+            frame = frame[top:top + crop_height, left:left + crop_width]
+        return frame
+
+    def _buffer(self, shape):
+        cached = getattr(self._local, "buffer", None)
+        if cached is None or cached.shape != shape:
+            cached = np.empty(shape, dtype=np.float32)
+            self._local.buffer = cached
+            self._local.mask = np.empty((shape[0], *shape[2:]), dtype=np.int64)
+        return cached, self._local.mask
+
+    def __call__(self, frames, bgr=True):
+        """Model inputs (torch tensors) for a batch of uint8 frames, padded like DETR where needed.
+
+        The tensors are views of a per-thread buffer that the next call on the
+        same thread overwrites; they are meant to be fed to the model right away.
+        """
+        resized = [self._resize(frame) for frame in frames]
+        height = max(image.shape[0] for image in resized)
+        width = max(image.shape[1] for image in resized)
+        batch, mask = self._buffer((len(resized), 3, height, width))
+
+        padded = any(image.shape[:2] != (height, width) for image in resized)
+        if padded:
+            batch.fill(0)
+        if self.with_pixel_mask:
+            mask.fill(0)
+        for index, image in enumerate(resized):
+            rows, cols = image.shape[:2]
+            channels = image[..., ::-1] if bgr else image
+            target = batch[index, :, :rows, :cols]
+            np.multiply(channels.transpose(2, 0, 1), self.multiplier, out=target)
+            target += self.offset
+            if self.with_pixel_mask:
+                mask[index, :rows, :cols] = 1
+
+        inputs = {"pixel_values": torch.from_numpy(batch)}
+        if self.with_pixel_mask:
+            inputs["pixel_mask"] = torch.from_numpy(mask)
+        return inputs
+
+
+def build_preprocessor(hf_processor):
+    """Fast preprocessor for a loaded HF image processor, or None to keep using the HF one."""
+    if not FAST_PREPROCESSING:
+        return None
+    if type(hf_processor).__name__ not in SUPPORTED_PROCESSORS:
+        logger.info(f"No fast preprocessing for {type(hf_processor).__name__}; using the HF processor")
+        return None
+    return FastImagePreprocessor(hf_processor)
+
@@ -0,0 +1,31 @@
+import logging
+import torch
+
+logger = logging.getLogger(__name__)
+
+QUANTIZATION_MODES = ("none", "dynamic_int8")
+
+
+def quantize_model(model, mode="none", device=None, name="model"):
+    """Return `model` prepared for the requested quantization mode.
+
+    "dynamic_int8" converts the nn.Linear layers (the transformer encoder/decoder
+    and the heads, where most CPU time goes) to int8 weights with activations
+    quantized on the fly. No calibration data is needed. Convolutions in the
+    backbone stay fp32.
+    """
+    if mode not in QUANTIZATION_MODES:
+        raise ValueError(f"Unknown quantization mode '{mode}'. Expected one of {QUANTIZATION_MODES}")
+    if mode == "none":
+        return model
+    if device is not None and device.type != "cpu":
+        logger.warning(f"Skipping {mode} quantization of {name}: only supported on CPU (device is {device})")
+        return model
+    if not isinstance(model, torch.nn.Module):
+        logger.warning(f"Skipping {mode} quantization of {name}: not a PyTorch model")
+        return model
+
+    quantized = torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    logger.info(f"Quantized {name} with {mode}")
+    return quantized
@@ -0,0 +1,123 @@
+import random
+import threading
+import time
+
+BASE_DELAY = 1.0  # seconds before the first retry
+MAX_DELAY = 60.0  # backoff cap
+JITTER = 0.5  # fraction of each delay that is randomised
+MAX_CONCURRENT_ATTEMPTS_PER_NVR = 2
+
+
+class ReconnectScheduler:
+    """Shared reconnect schedule for all camera threads, keyed by NVR.
+
+    Each camera backs off exponentially (with jitter) after failed connection
+    attempts, and at most `max_concurrent` cameras of the same NVR may be
+    connecting at once, so an NVR reboot does not turn into a reconnect storm.
+    """
+
+    def __init__(self, base_delay=BASE_DELAY, max_delay=MAX_DELAY, jitter=JITTER,
+                 max_concurrent=MAX_CONCURRENT_ATTEMPTS_PER_NVR):
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.jitter = jitter
+        self.max_concurrent = max_concurrent
+        self._lock = threading.Lock()
+        self._states = {}  # camera_id -> schedule state
+        self._slots = {}  # nvr_id -> semaphore limiting concurrent attempts
+
+    def _state(self, camera_id, nvr_id=None):
+        state = self._states.get(camera_id)
+        if state is None:
+            state = {"nvr_id": nvr_id, "failures": 0, "next_retry_at": 0.0, "state": "idle", "holding": False}
+            self._states[camera_id] = state
+        elif nvr_id is not None:
+            state["nvr_id"] = nvr_id
+        return state
+
+    def _nvr_slots(self, nvr_id):
+        slots = self._slots.get(nvr_id)
+        if slots is None:
+            slots = threading.BoundedSemaphore(self.max_concurrent)
+            self._slots[nvr_id] = slots
+        return slots
+
+    def acquire(self, camera_id, nvr_id, should_stop, poll=0.5):
+        """Block until the camera's retry time has passed and an NVR slot is free.
+
+        Returns False if `should_stop()` became true while waiting.
+        """
+        with self._lock:
+            state = self._state(camera_id, nvr_id)
+            state["state"] = "waiting"
+            slots = self._nvr_slots(nvr_id)
+
+        while not should_stop():
+            wait = state["next_retry_at"] - time.time()
+            if wait > 0:
+                time.sleep(min(wait, poll))
+                continue
+            if slots.acquire(timeout=poll):
+                with self._lock:
+                    state["state"] = "connecting"
+                    state["holding"] = True
+                return True
+        with self._lock:
+            state["state"] = "stopped"
+        return False
+
+    def release(self, camera_id):
+        """Give back the NVR slot taken by `acquire`."""
+        with self._lock:
+            state = self._states.get(camera_id)
+            if state is None or not state["holding"]:
+                return
+            state["holding"] = False
+            slots = self._nvr_slots(state["nvr_id"])
+        slots.release()
+
+    def record_success(self, camera_id):
+        with self._lock:
+            state = self._state(camera_id)
+            state["failures"] = 0
+            state["next_retry_at"] = 0.0
+            state["state"] = "connected"
+
+    def record_failure(self, camera_id):
+        """Schedule the next attempt and return the delay in seconds."""
+        with self._lock:
+            state = self._state(camera_id)
+            state["failures"] += 1
+            delay = min(self.max_delay, self.base_delay * (2 ** (state["failures"] - 1)))
+            delay = delay * (1 - self.jitter) + random.uniform(0, delay * self.jitter)
+            state["next_retry_at"] = time.time() + delay
+            state["state"] = "backoff"
+            return delay
+
+    def failure_count(self, camera_id):
+        with self._lock:
+            state = self._states.get(camera_id)
+            return state["failures"] if state else 0
+
+    def forget(self, camera_id):
+        self.release(camera_id)
+        with self._lock:
+            self._states.pop(camera_id, None)
+
+    def snapshot(self):
+        """Schedule of every known camera, for the API."""
+        now = time.time()
+        with self._lock:
+            return {
+                camera_id: {
+                    "nvr_id": state["nvr_id"],
+                    "state": state["state"],
+                    "failures": state["failures"],
+                    "next_retry_at": state["next_retry_at"] or None,
+                    "seconds_until_retry": round(max(0.0, state["next_retry_at"] - now), 2)
+                }
+                for camera_id, state in self._states.items()
+            }
+
+
+reconnect_scheduler = ReconnectScheduler()
@@ -1,9 +1,140 @@
+import gc
 import json
-from service.UnifiedProcessor import UnifiedProcessor
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from service.UnifiedProcessor import UnifiedProcessor, MODE_DETECTORS, MODEL_CONCURRENCY
+from service.batch_inference_service import BatchInferenceServer, BATCHING_ENABLED, MAX_BATCH_SIZE
+from service.tiling_service import split_frame, merge_tile_detections
+
+logger = logging.getLogger(__name__)
+
+DRAIN_TIMEOUT_S = float(os.environ.get("VIGILNET_POOL_DRAIN_TIMEOUT_S", "60"))
+
+model_pool = None
+pool_ready = threading.Event()  # set once the first pool has been warmed up
+reload_lock = threading.Lock()  # one pool is built at a time
+swap_reports = []  # latest model swaps, newest last
+MAX_SWAP_REPORTS = 10
+batch_servers = {}  # detection mode -> BatchInferenceServer
+batch_server_lock = threading.Lock()
+
+
+class PoolRetired(Exception):
+    """Raised by ModelPool.acquire once the pool has been replaced; the caller retries on the new pool."""
+
+
+class ModelPool:
+    """Single set of loaded models shared by every camera thread.
+
+    Read-only weights are loaded once; concurrency is bounded per model by a
+    semaphore instead of by the number of copies. Callers check out an
+    inference context and release it when the forward pass is done.
+    """
+
+    def __init__(self, processor, limits=None):
+        self.processor = processor
+        self.limits = dict(limits or MODEL_CONCURRENCY)
+        self._slots = {name: threading.BoundedSemaphore(limit) for name, limit in self.limits.items()}
+        self._lock = threading.Lock()
+        self._drained = threading.Condition(self._lock)
+        self.in_use = {name: 0 for name in self.limits}
+        self.inflight = 0
+        self.checkouts = 0
+        self.total_wait = 0.0
+        self.retired = False
+        self.first_release_at = None
+        self.last_release_at = None
+
+    def acquire(self, models=None, timeout=None):
+        """Reserve a slot on each requested model and return the shared processor.
+
+        Models are always acquired in the same order so concurrent checkouts of
+        overlapping model sets cannot deadlock.
+        """
+        models = sorted(models or self.limits)
+        started = time.time()
+        acquired = []
+        for name in models:
+            if not self._slots[name].acquire(timeout=timeout):
+                self._release(acquired)
+                raise TimeoutError(f"Timed out waiting for a free '{name}' model slot")
+            acquired.append(name)
+        with self._lock:
+            if self.retired:
+                retired = True
+            else:
+                retired = False
+                for name in acquired:
+                    self.in_use[name] += 1
+                self.inflight += 1
+                self.checkouts += 1
+                self.total_wait += time.time() - started
+        if retired:
+            for name in reversed(acquired):
+                self._slots[name].release()
+            raise PoolRetired()
+        return self.processor
+
+    def release(self, models=None):
+        models = sorted(models or self.limits)
+        with self._lock:
+            now = time.time()
+            self.first_release_at = self.first_release_at or now
+            self.last_release_at = now
+            self.inflight -= 1
+            if not self.inflight:
+                self._drained.notify_all()
+        self._release(models)
+
+    def _release(self, models):
+        with self._lock:
+            for name in models:
+                self.in_use[name] = max(0, self.in_use[name] - 1)
+        for name in reversed(models):
+            self._slots[name].release()
+
+    def retire(self, timeout=DRAIN_TIMEOUT_S):
+        """Stop new checkouts, wait for in-flight inferences to finish and drop the models.
+
+        Returns (in-flight count when retired, seconds spent draining, whether it drained in time).
+        """
+        started = time.time()
+        with self._lock:
+            self.retired = True
+            inflight = self.inflight
+            drained = self._drained.wait_for(lambda: not self.inflight, timeout=timeout)
+        self.processor = None
+        gc.collect()
+        return inflight, round(time.time() - started, 3), drained
+
+    @contextmanager
+    def checkout(self, models=None, timeout=None):
+        processor = self.acquire(models, timeout=timeout)
+        try:
+            yield processor
+        finally:
+            self.release(models)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "limits": dict(self.limits),
+                "in_use": dict(self.in_use),
+                "checkouts": self.checkouts,
+                "inflight": self.inflight,
+                "avg_checkout_wait_ms": round(1000 * self.total_wait / self.checkouts, 2) if self.checkouts else 0.0
+            }
+
+
+def concurrent_inferences():
+    """Forward passes one process may run at once, used to size its torch thread pool."""
+    if BATCHING_ENABLED:
+        return len(MODEL_CONCURRENCY)  # one batch in flight per model
+    return sum(MODEL_CONCURRENCY.values())
 
-processors = []
-NUM_PROCESSORS = 4
-current_index = 0
 
 def load_model_paths(json_path="modelRepository/modelUsageStatus.json"):
     try:
@@ -13,26 +144,186 @@ def load_model_paths(json_path="modelRepository/modelUsageStatus.json"):
     except Exception as e:
         raise RuntimeError(f"Failed to load model paths: {e}")
 
+def load_model_backends(json_path="modelRepository/modelUsageStatus.json"):
+    """Inference backend per detector ("torch" or "onnx"); missing keys mean PyTorch."""
+    try:
+        with open(json_path, "r") as f:
+            data = json.load(f)
+            return {
+                "animal": data.get("animalModelBackend", "torch"),
+                "human": data.get("humanModelBackend", "torch")
+            }
+    except Exception as e:
+        raise RuntimeError(f"Failed to load model backends: {e}")
+
+def load_model_quantization(json_path="modelRepository/modelUsageStatus.json"):
+    """Quantization mode per model ("none" or "dynamic_int8"); missing keys mean fp32."""
+    try:
+        with open(json_path, "r") as f:
+            data = json.load(f)
+            return {
+                "animal": data.get("animalModelQuantization", "none"),
+                "human": data.get("humanModelQuantization", "none")
+            }
+    except Exception as e:
+        raise RuntimeError(f"Failed to load model quantization: {e}")
+
 def get_processors():
-    global processors
-    processors.clear()
+    """Load the models of modelUsageStatus.json into a new pool.
 
-    animal_path, human_path = load_model_paths()
-    print("Creating unified instance with animal model path : ",animal_path)
-    print("Creating unified instance with human model path : ",human_path)
+    On first start the pool is published before loading, so each mode serves
+    as soon as its own detectors are ready. On a reload the new pool is built
+    and warmed while the current one keeps serving, then swapped in with one
+    reference assignment; the old pool is retired once its in-flight
+    inferences have finished.
+    """
+    global model_pool
 
-    for _ in range(NUM_PROCESSORS):
+    with reload_lock:
+        animal_path, human_path = load_model_paths()
+        backends = load_model_backends()
+        quantization = load_model_quantization()
+        print("Creating unified instance with animal model path : ",animal_path)
+        print("Creating unified instance with human model path : ",human_path)
+        print("Detector backends : ",backends)
+        print("Model quantization : ",quantization)
+
+        started = time.time()
         processor = UnifiedProcessor(
             animal_model_path=animal_path,
-            human_model_path=human_path
+            human_model_path=human_path,
+            backends=backends,
+            quantization=quantization,
+            load=False
         )
-        processors.append(processor)
+        # Each detector is warmed up before it serves, so cameras never hit a cold model
+        batch_sizes = (1, MAX_BATCH_SIZE) if BATCHING_ENABLED and MAX_BATCH_SIZE > 1 else (1,)
+        old_pool = model_pool
+        if old_pool is None:
+            # Nothing is serving yet: publish now so each mode starts as soon as its own detectors are ready
+            model_pool = ModelPool(processor)
+            processor.load(batch_sizes)
+            pool_ready.set()
+            return model_pool
+
+        processor.load(batch_sizes)  # The old pool keeps serving meanwhile
+        new_pool = ModelPool(processor)
+        load_s = round(time.time() - started, 3)
+
+        swap_started = time.perf_counter()
+        model_pool = new_pool
+        swap_ms = round(1000 * (time.perf_counter() - swap_started), 3)
+
+        report = {
+            "swapped_at": time.time(),
+            "load_s": load_s,
+            "swap_ms": swap_ms,
+            "inflight_at_swap": None,  # drain fields are filled in once the old pool has drained
+            "drain_s": None,
+            "drained": None,
+            "old_pool": old_pool,
+            "new_pool": new_pool
+        }
+        swap_reports.append(report)
+        del swap_reports[:-MAX_SWAP_REPORTS]
+        logger.info(f"Model pool swapped: loaded in {load_s}s, swap {swap_ms}ms")
+        # In-flight inferences can take a while to finish; the caller (an HTTP request) does not wait for them
+        threading.Thread(target=drain_pool, args=(old_pool, report), name="model-pool-drain", daemon=True).start()
+        return model_pool
+
+def drain_pool(pool, report):
+    """Retire a swapped-out pool and record how long its in-flight inferences took to finish."""
+    inflight, drain_s, drained = pool.retire()
+    report.update(inflight_at_swap=inflight, drain_s=drain_s, drained=drained)
+    if not drained:
+        logger.warning(f"Old model pool still had in-flight inferences after {drain_s}s; released anyway")
+    logger.info(f"Old model pool drained {inflight} in-flight inference(s) in {drain_s}s")
+
+def get_swap_reports():
+    """Latency of the recent pool swaps and the detection gap each caused.
 
-def get_next_processor():
-    global current_index
-    if not processors:
+    The gap is the time between the last inference finished on the old pool and
+    the first on the new one (None until the new pool has served); with cameras
+    running it is bounded by the normal spacing between inferences.
+    """
+    reports = []
+    for report in list(swap_reports):
+        old_pool, new_pool = report["old_pool"], report["new_pool"]
+        gap = None
+        if new_pool.first_release_at is not None:
+            gap = round(max(0.0, new_pool.first_release_at - (old_pool.last_release_at or report["swapped_at"])), 3)
+        reports.append({key: value for key, value in report.items() if key not in ("old_pool", "new_pool")}
+                       | {"detection_gap_s": gap})
+    return reports
+
+def models_ready(mode=None):
+    """True once the detectors of `mode` can serve; without a mode, once every detector is ready."""
+    if mode is None:
+        return pool_ready.is_set()
+    pool = model_pool
+    return pool is not None and pool.processor is not None and pool.processor.is_ready(mode)
+
+def get_model_pool():
+    if model_pool is None:
         raise RuntimeError("Processors not initialized. Call get_processors() first.")
+    return model_pool
+
+@contextmanager
+def checkout_models(models):
+    """Check out the current pool's processor, moving to the new pool if a swap retires it meanwhile."""
+    while True:
+        pool = get_model_pool()
+        try:
+            processor = pool.acquire(models)
+            break
+        except PoolRetired:
+            continue
+    try:
+        yield processor
+    finally:
+        pool.release(models)
+
+
+def batched_detection(frames, mode="both"):
+    with checkout_models(MODE_DETECTORS[mode]) as processor:
+        return processor.process_frames(frames, mode=mode)
+
+def get_batch_server(mode="both"):
+    """Cross-camera batching server for a detection mode, started on first use."""
+    with batch_server_lock:
+        server = batch_servers.get(mode)
+        if server is None:
+            server = BatchInferenceServer(lambda frames: batched_detection(frames, mode), name=mode)
+            batch_servers[mode] = server
+        return server
+
+def run_detection(frame_id, frame, camera_id, mode="both", tiling=None):
+    """Detections of the mode's detectors for one camera frame, batched across cameras when enabled.
+
+    With `tiling` ({"size", "overlap"}) the frame is split into overlapping tiles
+    that go through the detector as one batch together with the whole frame.
+    """
+    frames, grid = split_frame(frame, tiling)
+    if frames is None:
+        if BATCHING_ENABLED:
+            return get_batch_server(mode).infer(frame)
+        with checkout_models(MODE_DETECTORS[mode]) as processor:
+            return processor.process_frame(frame_id, frame, camera_id, mode=mode)
+
+    if BATCHING_ENABLED:
+        # Submitted together, so the tiles are collected into the same batch(es)
+        server = get_batch_server(mode)
+        futures = [server.submit(tile) for tile in frames]
+        per_tile = [future.result() for future in futures]
+    else:
+        with checkout_models(MODE_DETECTORS[mode]) as processor:
+            per_tile = processor.process_frames(frames, mode=mode)
+    return merge_tile_detections(per_tile, grid)
+
+def get_batch_stats():
+    with batch_server_lock:
+        servers = dict(batch_servers)
+    return {mode: server.stats() for mode, server in servers.items()} or None
 
-    proc = processors[current_index]
-    current_index = (current_index + 1) % NUM_PROCESSORS
-    return proc
+def get_model_pool_stats():
+    return model_pool.stats() if model_pool is not None else None
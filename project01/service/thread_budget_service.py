@@ -0,0 +1,76 @@
+import logging
+import os
+
+import cv2
+import torch
+
+logger = logging.getLogger(__name__)
+
+# Cores the app may use; the other settings override the computed split
+CPU_CORES = int(os.environ.get("VIGILNET_CPU_CORES", "0")) or (os.cpu_count() or 1)
+TORCH_THREADS = int(os.environ.get("VIGILNET_TORCH_THREADS", "0"))
+INTEROP_THREADS = int(os.environ.get("VIGILNET_INTEROP_THREADS", "1"))
+CV2_THREADS = int(os.environ.get("VIGILNET_CV2_THREADS", "1"))
+
+thread_layout = {}
+
+
+def plan_thread_budget(processes, concurrent_inferences, cores=CPU_CORES):
+    """Split the cores between inference processes and the forward passes each runs at once.
+
+    Camera threads already run inference and OpenCV work in parallel, so each
+    forward pass gets its share of the cores as intra-op threads instead of
+    every call trying to use the whole machine. Inter-op and OpenCV pools stay
+    at one thread by default, since their parallelism comes from the cameras.
+    """
+    processes = max(1, processes)
+    concurrent_inferences = max(1, concurrent_inferences)
+    cores_per_process = max(1, cores // processes)
+    intra_op = TORCH_THREADS or max(1, cores_per_process // concurrent_inferences)
+    return {
+        "cores": cores,
+        "processes": processes,
+        "cores_per_process": cores_per_process,
+        "concurrent_inferences": concurrent_inferences,
+        "torch_intra_op_threads": intra_op,
+        "torch_interop_threads": INTEROP_THREADS,
+        "cv2_threads": CV2_THREADS,
+        "peak_inference_threads": processes * concurrent_inferences * intra_op
+    }
+
+
+def apply_thread_budget(processes, concurrent_inferences, cores=CPU_CORES):
+    """Apply the plan to this process and log the effective layout."""
+    global thread_layout
+
+    plan = plan_thread_budget(processes, concurrent_inferences, cores)
+    torch.set_num_threads(plan["torch_intra_op_threads"])
+    try:
+        torch.set_num_interop_threads(plan["torch_interop_threads"])
+    except RuntimeError as e:
+        # Only settable before the first inter-op parallel work in the process
+        logger.warning(f"Could not set torch inter-op threads: {e}")
+    cv2.setNumThreads(plan["cv2_threads"])
+
+    plan["effective"] = {
+        "torch_intra_op_threads": torch.get_num_threads(),
+        "torch_interop_threads": torch.get_num_interop_threads(),
+        "cv2_threads": cv2.getNumThreads()
+    }
+    thread_layout = plan
+    logger.info(
+        f"Thread budget (pid {os.getpid()}): {plan['cores']} cores, {plan['processes']} inference process(es), "
+        f"{plan['concurrent_inferences']} concurrent forward pass(es) x {plan['effective']['torch_intra_op_threads']} "
+        f"intra-op thread(s), {plan['effective']['torch_interop_threads']} inter-op, "
+        f"{plan['effective']['cv2_threads']} OpenCV; peak {plan['peak_inference_threads']} inference threads"
+    )
+    if plan["peak_inference_threads"] > plan["cores"]:
+        logger.warning(
+            f"Thread budget oversubscribes {plan['cores']} cores "
+            f"({plan['peak_inference_threads']} inference threads); lower the worker or model concurrency"
+        )
+    return plan
+
+
+def get_thread_layout():
+    return dict(thread_layout)
@@ -0,0 +1,103 @@
+import numpy as np
+
+from service.detection_array_service import concat_detections, empty_detections
+
+try:
+    import torch
+    from torchvision.ops import batched_nms
+except ImportError:
+    batched_nms = None  # NumPy NMS is used instead
+
+NMS_IOU_THRESHOLD = 0.5
+
+
+def tile_grid(height, width, tile_size, overlap):
+    """Overlapping (x0, y0, x1, y1) tiles covering the frame; the last row/column is snapped to the edge."""
+    stride = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, stride))
+        return positions + [length - tile_size]
+
+    return np.array([
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ], dtype=np.int32)
+
+
+def non_max_suppression(detections, iou_threshold=NMS_IOU_THRESHOLD):
+    """Class-aware NMS over a structured detection array, highest confidence first.
+
+    Runs torchvision's batched_nms (one C++ kernel over every class) when
+    torchvision is installed, and the NumPy version otherwise.
+    """
+    if len(detections) < 2:
+        return detections
+    if batched_nms is None:
+        return _numpy_nms(detections, iou_threshold)
+    boxes = np.stack([detections["xmin"], detections["ymin"], detections["xmax"], detections["ymax"]], axis=1)
+    _, class_ids = np.unique(detections["class"], return_inverse=True)
+    keep = batched_nms(torch.from_numpy(boxes.astype(np.float32)),
+                       torch.from_numpy(detections["confidence"].astype(np.float32)),
+                       torch.from_numpy(class_ids.astype(np.int64)), iou_threshold)
+    return detections[keep.numpy()]
+
+
+def _numpy_nms(detections, iou_threshold):
+    """IoUs of all pairs are computed at once; the greedy pass then only flips rows of a boolean matrix."""
+    order = np.argsort(-detections["confidence"], kind="stable")
+    detections = detections[order]
+
+    x0, y0 = detections["xmin"].astype(np.float32), detections["ymin"].astype(np.float32)
+    x1, y1 = detections["xmax"].astype(np.float32), detections["ymax"].astype(np.float32)
+    areas = np.clip(x1 - x0, 0, None) * np.clip(y1 - y0, 0, None)
+    inter_w = np.clip(np.minimum(x1[:, None], x1[None, :]) - np.maximum(x0[:, None], x0[None, :]), 0, None)
+    inter_h = np.clip(np.minimum(y1[:, None], y1[None, :]) - np.maximum(y0[:, None], y0[None, :]), 0, None)
+    inter = inter_w * inter_h
+    union = areas[:, None] + areas[None, :] - inter
+    iou = np.divide(inter, union, out=np.zeros_like(inter), where=union > 0)
+
+    overlaps = (iou > iou_threshold) & (detections["class"][:, None] == detections["class"][None, :])
+    overlaps = np.triu(overlaps, k=1)  # Only a higher-scored box can suppress a lower one
+    keep = np.ones(len(detections), dtype=bool)
+    for index in range(len(detections)):
+        if keep[index]:
+            keep &= ~overlaps[index]
+    return detections[keep]
+
+
+def merge_tile_detections(per_tile, grid, iou_threshold=NMS_IOU_THRESHOLD):
+    """Shift each tile's detections to frame coordinates and merge duplicates across tiles.
+
+    `per_tile` lines up with `grid`; an extra trailing entry is the full-frame pass.
+    """
+    shifted = []
+    for detections, (x0, y0, _, _) in zip(per_tile, grid):
+        if not len(detections):
+            continue
+        detections = detections.copy()
+        detections["xmin"] += x0
+        detections["xmax"] += x0
+        detections["ymin"] += y0
+        detections["ymax"] += y0
+        shifted.append(detections)
+    shifted.extend(per_tile[len(grid):])
+    merged = concat_detections(shifted)
+    return non_max_suppression(merged, iou_threshold) if len(merged) else empty_detections()
+
+
+def split_frame(frame, tiling):
+    """Tiles (views) plus the whole frame, and the tile grid; None if the frame fits in one tile."""
+    if not tiling:
+        return None, None
+    height, width = frame.shape[:2]
+    tile_size = tiling["size"]
+    if height <= tile_size and width <= tile_size:
+        return None, None
+    grid = tile_grid(height, width, tile_size, tiling.get("overlap", 0.2))
+    tiles = [frame[y0:y1, x0:x1] for x0, y0, x1, y1 in grid]
+    # The full frame rides along in the same batch so objects larger than a tile are still found
+    return tiles + [frame], grid
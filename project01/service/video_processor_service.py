@@ -7,8 +7,15 @@ import numpy as np
 from collections import deque
 from Processor.AoS import BackgroundSubtractor
 from Processor.depth import DepthEstimator
+from Processor.motion_detection import MotionGate, MOTION_GATE_ENABLED
+from Processor.roi import RegionOfInterest
+from Processor.tracker import SortTracker, DETECT_EVERY_N
 from models.recording import Recording
 from service.frames_optimiser_service import FrameEnhancer
+from service.frame_grabber_service import FrameGrabber
+from service.ffmpeg_ingest_service import FFmpegCapture, probe_keyframe_interval
+from service.reconnect_scheduler_service import reconnect_scheduler
+from service.frame_bus_service import publish_frame, close_rings, open_consumer_ring, close_consumer_ring, SLOT_COUNT
 from models.camera import Camera
 import os
 import pickle
@@ -18,24 +25,38 @@ from service.log_notifier_service import emit_recording_event, emit_camera_statu
 
 from service.log_notifier_service import emit_log_event,emit_frame
 
-from service.rtdetr_manager_service import get_next_processor
+from service.rtdetr_manager_service import run_detection, get_processors, get_batch_stats, models_ready, \
+    get_swap_reports
+from service.model_warmup_service import get_warmup_reports, register_frame_shape, forget_frame_shape
+from service.thread_budget_service import get_thread_layout
+from service.latency_stats_service import timed, record_stage, get_latency_stats, forget_camera
+from service.model_loading_service import load_model, get_model_load_status
+from service.UnifiedProcessor import DETECTION_MODES, MODE_DETECTORS
+from service.camera_worker_pool_service import camera_worker_pool, configured_worker_count
 
 recording_states = {}  # Per camera recording state
-detection_streaks = {}
-no_detection_counts = {}
-recording_buffers = {}
 processed_frames = {}
 camera_feed_status = {}  # Stores the status of each camera
 frame_lock = threading.Lock()  # Prevent race conditions
 camera_threads = {}  # Tracks running threads
+frame_grabbers = {}  # Capture thread per camera (latest-frame mailbox)
+motion_gates = {}  # Per-camera motion state deciding when the detector runs
+last_detections = {}  # camera_id -> (mode, detections) reused while the scene is static
+trackers = {}  # camera_id -> SortTracker; track births/deaths drive logging and recording
+camera_rois = {}  # camera_id -> RegionOfInterest; cameras without one use the whole frame
+camera_tiling = {}  # camera_id -> {"size", "overlap"} for tiled inference on high-resolution cameras
 stop_flags = {}  # Flags to control thread execution
 model_selected='none'
-depth_processor=DepthEstimator()
+PIPELINE_MODES = ("none", *DETECTION_MODES, "depth", "AOS")  # values accepted by model_changed
+depth_processor = None  # Loaded in the background the first time depth mode is selected
+depth_loading = False
+depth_lock = threading.Lock()
 AOS_Processor=BackgroundSubtractor()
 processed_frame_queue = deque(maxlen=5)
 frame_optimiser=FrameEnhancer()
 frame_optimiser_status=False
 csv_path = "C:/AI_VIGILNET/detections/detections.csv"
+RECORD_PREROLL_S = 30  # seconds of processed frames kept ahead of a recording trigger in detection modes
 
 logging.basicConfig(
     level=logging.INFO,
@@ -76,10 +97,69 @@ def analyze_frame_conditions(frame):
 def model_changed(model_name):
     global model_selected
     model_selected = model_name
+    if camera_worker_pool.active:
+        # The shards run the cameras, so only they load the depth model
+        camera_worker_pool.broadcast("model", value=model_name)
+    elif model_name == "depth":
+        ensure_depth_processor()
     # Chaning mode without restaring the thread !
     # app,db = get_app_and_socketio()
     # start_processing(app)
 
+def ensure_depth_processor():
+    """Start loading and warming up the depth model in the background, once."""
+    global depth_loading
+    with depth_lock:
+        if depth_loading or depth_processor is not None:
+            return
+        depth_loading = True
+    threading.Thread(target=load_depth_processor, daemon=True).start()
+
+
+def load_depth_processor():
+    global depth_processor, depth_loading
+    try:
+        depth_processor = load_model("depth", DepthEstimator, warm=lambda processor: processor.warm_up())
+    except Exception as e:
+        logger.error(f"Failed to load the depth model: {e}")
+    finally:
+        with depth_lock:
+            depth_loading = False
+
+
+def required_models(mode):
+    """Models a pipeline mode needs before it produces output."""
+    if mode == "depth":
+        return ("depth",)
+    return MODE_DETECTORS.get(mode, ())
+
+
+def mode_ready(mode):
+    """True if a pipeline mode can produce output now (a model being reloaded keeps serving its old version)."""
+    if mode == "depth":
+        return depth_processor is not None and depth_processor.ready.is_set()
+    if mode in DETECTION_MODES:
+        return models_ready(mode)
+    return True
+
+
+def get_model_readiness():
+    """Load state and timings of every model, and whether the selected mode can serve, per process."""
+    if camera_worker_pool.active:
+        models = camera_worker_pool.model_status()
+        serving = camera_worker_pool.mode_readiness()
+        ready = len(serving) == len(camera_worker_pool.workers) and all(serving.values())
+    else:
+        models = {"local": get_model_load_status()}
+        ready = mode_ready(model_selected)
+    return {
+        "model_selected": model_selected,
+        "required": list(required_models(model_selected)),
+        "ready": ready,
+        "models": models
+    }
+
+
 def get_selected_model_from_service():
     global model_selected
     return model_selected
@@ -87,6 +167,8 @@ def get_selected_model_from_service():
 def change_frame_enhancer(status):
     global frame_optimiser_status
     frame_optimiser_status = status
+    if camera_worker_pool.active:
+        camera_worker_pool.broadcast("frame_enhancer", value=status)
     # Chaning mode without restaring the thread !
     # app,db = get_app_and_socketio()
     # start_processing(app)
@@ -97,16 +179,58 @@ def get_frame_enhancer_status():
 
 
 def start_processing(app):
-    """ Start processing video streams for all cameras in separate threads. """
+    """ Start processing video streams for all cameras in separate threads (or worker processes). """
     with app.app_context():
         cameras = Camera.query.all()
 
+    num_workers = configured_worker_count()
+    if num_workers and not camera_worker_pool.active:
+        # Only as many workers as cameras are started now; the pool grows up to num_workers as cameras are added
+        camera_worker_pool.start(num_workers, {
+            "model": model_selected,
+            "frame_enhancer": frame_optimiser_status,
+            "inference_sizes": {camera.id: camera.processing_options()["inference_size"] for camera in cameras}
+        }, initial_workers=len(cameras))
+
     for camera in cameras:
-        restart_processing(camera.id, camera.url)
+        restart_processing(camera.id, camera.url, camera.processing_options())
+
+
+def register_camera_frame_shapes():
+    """Tell the model warm-up which frame sizes the cameras use; call in an app context before loading models."""
+    for camera in Camera.query.all():
+        register_frame_shape(camera.id, camera.processing_options()["inference_size"])
 
 
 def stop_processing(camera_id):
     """Stop processing frames and recording for a specific camera."""
+    if camera_worker_pool.active:
+        camera_worker_pool.stop_camera(camera_id)
+        return
+    stop_camera_thread(camera_id)
+
+
+def restart_processing(camera_id, new_rtsp_url, options=None):
+    """ Restart processing for a camera with a new RTSP URL. """
+    if camera_worker_pool.active:
+        camera_worker_pool.restart_camera(camera_id, new_rtsp_url, options)
+        return
+    restart_camera_thread(camera_id, new_rtsp_url, options)
+
+
+def reload_processors():
+    """Reload the detection models wherever cameras are processed.
+
+    Returns {worker index: {"ok", "error"}} in worker mode and None in thread mode, where a failure raises.
+    """
+    if camera_worker_pool.active:
+        return camera_worker_pool.reload_models()
+    get_processors()
+    return None
+
+
+def stop_camera_thread(camera_id):
+    """Stop the processing thread of a camera running in this process."""
     logger.info(f"[Camera-{camera_id}] Stopping processing...")
     # Signal the fetch-and-process thread to stop
     if camera_id in stop_flags:
@@ -133,70 +257,171 @@ def stop_processing(camera_id):
 
     # Cleanup all camera-related state
     recording_states.pop(camera_id, None)
-    detection_streaks.pop(camera_id, None)
-    no_detection_counts.pop(camera_id, None)
-    recording_buffers.pop(camera_id, None)
+    motion_gates.pop(camera_id, None)
+    camera_rois.pop(camera_id, None)
+    camera_tiling.pop(camera_id, None)
+    last_detections.pop(camera_id, None)
+    trackers.pop(camera_id, None)
+    forget_camera(camera_id)
+    forget_frame_shape(camera_id)
     processed_frames.pop(camera_id, None)
     camera_feed_status.pop(camera_id, None)
+    frame_grabbers.pop(camera_id, None)
+    reconnect_scheduler.forget(camera_id)
+    close_rings(camera_id)
 
     logger.info(f"[Camera-{camera_id}] Processing fully stopped and cleaned up.")
 
 
 
-def restart_processing(camera_id, new_rtsp_url):
-    """ Restart processing for a camera with a new RTSP URL. """
-    stop_processing(camera_id)  # Stop existing processing
+def restart_camera_thread(camera_id, new_rtsp_url, options=None):
+    """ Start (or restart) the processing thread of a camera in this process. """
+    stop_camera_thread(camera_id)  # Stop existing processing
     stop_flags[camera_id] = False  # Reset stop flag
+    register_frame_shape(camera_id, (options or {}).get("inference_size"))  # Warmed up on the next model reload
 
-    thread = threading.Thread(target=fetch_and_process, args=(camera_id, new_rtsp_url ), daemon=True)
+    thread = threading.Thread(target=fetch_and_process, args=(camera_id, new_rtsp_url),
+                              kwargs={"options": options}, daemon=True)
     camera_threads[camera_id] = thread
     thread.start()
     logger.info(f"Processing restarted for Camera ID {camera_id}")
 
 
 
-def fetch_and_process(camera_id, rtsp_url, target_fps=1):
+def use_keyframe_decode(camera_id, rtsp_url, options, target_fps):
+    """Decide whether the decoder can skip non-key frames for this camera.
+
+    "keyframe" forces it, "full" disables it and "auto" enables it only when the
+    sampling interval is at least the stream's keyframe interval. Only the ffmpeg
+    backend can skip frames in the decoder; OpenCV always decodes every frame.
+    """
+    decode_mode = options.get("decode_mode", "auto")
+    if decode_mode == "full":
+        return False
+    if options.get("ingest_backend") != "ffmpeg":
+        if decode_mode == "keyframe":
+            logger.warning(f"[Camera-{camera_id}] Keyframe decode needs the ffmpeg backend; using full decode.")
+        return False
+    if decode_mode == "keyframe":
+        return True
+
+    keyframe_interval = probe_keyframe_interval(rtsp_url)
+    if keyframe_interval is None:
+        return False
+    sample_interval = 1.0 / target_fps
+    enabled = sample_interval >= keyframe_interval
+    logger.info(f"[Camera-{camera_id}] Keyframe interval {keyframe_interval:.2f}s, sampling every "
+                f"{sample_interval:.2f}s -> {'keyframe-only' if enabled else 'full'} decode")
+    return enabled
+
+
+def open_capture(rtsp_url, options, keyframes_only=False):
+    """Open the camera stream with the ingest backend selected for the camera."""
+    if options.get("ingest_backend") == "ffmpeg":
+        # ffmpeg scales inside the decoder, so full-resolution frames never reach Python
+        width, height = options.get("inference_size") or (None, None)
+        return FFmpegCapture(rtsp_url, width=width, height=height, keyframes_only=keyframes_only)
+
+    cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
+    cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+
+def resize_for_inference(frame, inference_size):
+    """Downscale a decoded frame to the camera's inference size (no-op if unset or already sized)."""
+    if not inference_size:
+        return frame
+    width, height = inference_size
+    if frame.shape[1] == width and frame.shape[0] == height:
+        return frame
+    return cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+
+
+def fetch_and_process(camera_id, rtsp_url, target_fps=1, options=None):
+    options = options or {}
     frame_id = 0
     interval = 1.0 / target_fps
     last_processed_time = 0
 
-    while not stop_flags.get(camera_id, False):
-        logger.info(f"Connecting to RTSP stream for Camera ID {camera_id}...")
-        cap = cv2.VideoCapture(rtsp_url, cv2.CAP_FFMPEG)
-        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    nvr_id = options.get("nvr_id")
+    should_stop = lambda: stop_flags.get(camera_id, False)
+    if MOTION_GATE_ENABLED:
+        # Background model lives as long as the camera thread, across reconnects
+        motion_gates[camera_id] = MotionGate()
+    if options.get("roi"):
+        camera_rois[camera_id] = RegionOfInterest(options["roi"])
+    else:
+        camera_rois.pop(camera_id, None)
+    if options.get("tiling") and options.get("inference_size"):
+        # Frames are downscaled before detection, so tiles would hold no more detail than the whole frame
+        logger.warning(f"[Camera-{camera_id}] Tiling ignored: it needs native-resolution frames, "
+                       f"but an inference size is set")
+        camera_tiling.pop(camera_id, None)
+    elif options.get("tiling"):
+        camera_tiling[camera_id] = options["tiling"]
+    else:
+        camera_tiling.pop(camera_id, None)
 
-        if not cap.isOpened():
-            logger.error(f"Could not open RTSP stream for Camera ID {camera_id}. Retrying in 1 second...")
-            with frame_lock:
-                camera_feed_status[camera_id] = "Disconnected"
-            emit_camera_status(camera_id, "Disconnected")
-            emit_camera_status(camera_id, "Reconnecting")
-            time.sleep(1)
+    while not should_stop():
+        # Wait for this camera's backoff to expire and for a free connection slot on its NVR
+        if not reconnect_scheduler.acquire(camera_id, nvr_id, should_stop):
+            break
+        try:
+            logger.info(f"Connecting to RTSP stream for Camera ID {camera_id} "
+                        f"({options.get('ingest_backend', 'opencv')} backend)...")
+            keyframes_only = use_keyframe_decode(camera_id, rtsp_url, options, target_fps)
+            cap = open_capture(rtsp_url, options, keyframes_only=keyframes_only)
+            opened = cap.isOpened()
+        finally:
+            reconnect_scheduler.release(camera_id)
+
+        if not opened:
+            cap.release()
+            delay = reconnect_scheduler.record_failure(camera_id)
+            failures = reconnect_scheduler.failure_count(camera_id)
+            if failures == 1:
+                logger.error(f"Could not open RTSP stream for Camera ID {camera_id}. Retrying in {delay:.1f} seconds...")
+                with frame_lock:
+                    camera_feed_status[camera_id] = "Disconnected"
+                emit_camera_status(camera_id, "Disconnected")
+                emit_camera_status(camera_id, "Reconnecting")
+            else:
+                logger.info(f"Camera ID {camera_id} still unreachable after {failures} attempts. "
+                            f"Next retry in {delay:.1f} seconds.")
             continue
 
-        no_frame_count = 0
+        reconnect_scheduler.record_success(camera_id)
+
+        # Decoding runs on its own thread so inference time never backs up the RTSP socket
+        grabber = FrameGrabber(camera_id, cap, sample_interval=interval).start()
+        with frame_lock:
+            frame_grabbers[camera_id] = grabber
 
         while not stop_flags.get(camera_id, False):
-            ret, frame = cap.read()
-            if not ret:
-                logger.warning(f"No frame received from Camera ID {camera_id}")
-                no_frame_count += 1
-                time.sleep(1)
-                if no_frame_count >= 5:
-                    logger.error(f"No frames received for 1 second. Reconnecting Camera ID {camera_id}...")
+            wait = last_processed_time + interval - time.time()
+            if wait > 0:
+                time.sleep(min(wait, 0.5))
+                continue
+
+            wait_started = time.perf_counter()
+            frame = grabber.latest(timeout=1.0)
+            if frame is None:
+                if grabber.failed:
+                    logger.error(f"No frames received. Reconnecting Camera ID {camera_id}...")
                     with frame_lock:
                         camera_feed_status[camera_id] = "Disconnected"
                     emit_camera_status(camera_id, "Reconnecting")
+                    reconnect_scheduler.record_failure(camera_id)
                     break
                 continue
 
-            no_frame_count = 0
-            current_time = time.time()
-            if current_time - last_processed_time < interval:
-                cap.grab()
-                continue
+            last_processed_time = time.time()
+            frame_started = time.perf_counter()
+            record_stage(camera_id, "wait", frame_started - wait_started)
 
-            last_processed_time = current_time
+            # One early resize so enhancement, inference, drawing and encoding all run at model scale
+            with timed(camera_id, "resize"):
+                frame = resize_for_inference(frame, options.get("inference_size"))
 
             with frame_lock:
                 camera_feed_status[camera_id] = "Receiving Frames"
@@ -204,33 +429,109 @@ def fetch_and_process(camera_id, rtsp_url, target_fps=1):
 
             # Process frame without locking
             if frame_optimiser_status:
-                frame = frame_optimiser.enhance_frame(frame)
+                with timed(camera_id, "enhance"):
+                    frame = frame_optimiser.enhance_frame(frame)
 
-            processed_frame = process_frame_with_ai(frame, camera_id, frame_id)
+            with timed(camera_id, "ai"):
+                processed_frame = process_frame_with_ai(frame, camera_id, frame_id)
             frame_id += 1
 
+            # Publish to the shared-memory bus for consumers in any process (live view stream, recorder, ...).
+            # Modes that can trigger a recording keep enough frames for its pre-roll.
+            slots = SLOT_COUNT
+            if model_selected in DETECTION_MODES:
+                slots = max(SLOT_COUNT, int(RECORD_PREROLL_S * target_fps))
+            with timed(camera_id, "publish"):
+                publish_frame(camera_id, processed_frame, slots=slots)
+
             # Add frame to processed_frames
             with frame_lock:
             #   processed_frames[camera_id] = processed_frame
-                emit_frame(camera_id, processed_frame)
+                with timed(camera_id, "emit"):
+                    emit_frame(camera_id, processed_frame)
+            record_stage(camera_id, "total", time.perf_counter() - frame_started)
 
+        grabber.stop()
+    logger.info(f"Processing stopped for Camera ID {camera_id}")
 
-            _, buffer = cv2.imencode(".jpg", processed_frame)
-            frame_base64 = buffer.tobytes()
 
-        cap.release()
-    logger.info(f"Processing stopped for Camera ID {camera_id}")
+def get_capture_stats(camera_id=None):
+    """Frame counters of the capture threads, keyed by camera id."""
+    if camera_worker_pool.active:
+        stats = camera_worker_pool.capture_stats()
+    else:
+        with frame_lock:
+            grabbers = dict(frame_grabbers)
+        stats = {cam_id: grabber.stats() for cam_id, grabber in grabbers.items()}
+        for cam_id, gate in list(motion_gates.items()):
+            if cam_id in stats:
+                stats[cam_id]["motion_gate"] = gate.stats()
+        for cam_id, tracker in list(trackers.items()):
+            if cam_id in stats:
+                stats[cam_id]["active_tracks"] = tracker.active_count()
+    if camera_id is not None:
+        return {camera_id: stats[camera_id]} if camera_id in stats else {}
+    return stats
+
+
+def get_stage_latency(camera_id=None):
+    """Rolling p50/p95/p99 latency of each pipeline stage, keyed by camera id then stage."""
+    if camera_worker_pool.active:
+        stats = camera_worker_pool.latency_stats()
+        if camera_id is not None:
+            return {camera_id: stats[camera_id]} if camera_id in stats else {}
+        return stats
+    return get_latency_stats(camera_id)
+
+
+def get_model_swap_reports():
+    """Recent hot swaps of the detector pool, keyed by process ("local" or worker index)."""
+    if camera_worker_pool.active:
+        return camera_worker_pool.swap_reports()
+    reports = get_swap_reports()
+    return {"local": reports} if reports else {}
+
+
+def get_inference_batch_stats():
+    """Achieved batch sizes of the batching server(s), keyed by process ("local" or worker index)."""
+    if camera_worker_pool.active:
+        return camera_worker_pool.batch_stats()
+    stats = get_batch_stats()
+    return {"local": stats} if stats else {}
+
+
+def get_model_warmup_reports():
+    """Compile and warm-up timings of the loaded models, keyed by process ("local" or worker index)."""
+    if camera_worker_pool.active:
+        return camera_worker_pool.warmup_reports()
+    reports = get_warmup_reports()
+    return {"local": reports} if reports else {}
+
+
+def get_thread_layouts():
+    """Thread budget applied in each inference process ("local" or worker index)."""
+    if camera_worker_pool.active:
+        return dict(camera_worker_pool.thread_layouts)
+    layout = get_thread_layout()
+    return {"local": layout} if layout else {}
+
+
+def get_reconnect_status():
+    """Reconnect schedule of every camera, from this process or the worker shards."""
+    if camera_worker_pool.active:
+        return camera_worker_pool.reconnect_status()
+    return reconnect_scheduler.snapshot()
 
 
 
 
 
 def process_frame_with_ai(frame, camera_id, frame_id):
-    # If we switched away from "human", stop any active recording without blocking
-    if model_selected != "human":
+    # If we switched away from a detection mode, stop any active recording without blocking
+    if model_selected not in DETECTION_MODES:
         state = recording_states.get(camera_id)
         if state and state.get("is_recording", False) and not state.get("stop_in_progress", False):
-            logger.info(f"[Camera-{camera_id}] Model switched away from 'human'. Stopping recording.")
+            logger.info(f"[Camera-{camera_id}] Model switched away from detection. Stopping recording.")
 
             # ✅ Mark as stopping to avoid spawning multiple threads
             state["stop_in_progress"] = True
@@ -254,58 +555,32 @@ def process_frame_with_ai(frame, camera_id, frame_id):
     match model_selected:
         case "none":
             return frame
-        case "human":
-            return process_human_detection_with_recording(frame, camera_id, frame_id)
+        case "human" | "animal" | "both":
+            # Each mode runs only the detectors it needs (see UnifiedProcessor.MODE_DETECTORS)
+            return process_human_detection_with_recording(frame, camera_id, frame_id, mode=model_selected)
         case "depth":
-            return depth_processor.process_frame(frame)
+            if depth_processor is None or not depth_processor.ready.is_set():
+                return frame  # Still loading or warming up
+            with timed(camera_id, "depth"):
+                return depth_processor.process_frame(frame)
         case "AOS":
-            return AOS_Processor.process_external_frame(frame)
+            with timed(camera_id, "aos"):
+                return AOS_Processor.process_external_frame(frame)
         case _:
             return frame
-from datetime import datetime, timedelta
-
-# Tracks last seen timestamp per camera
-camera_presence_state = {}
 
-# Define how long absence must be to count as "new presence"
-absence_threshold_seconds = 30
-
-def should_emit_log(camera_id):
-    now = datetime.now()
-    last_seen = camera_presence_state.get(camera_id)
-
-    if last_seen is None:
-        # First time detection
-        camera_presence_state[camera_id] = now
-        return True
 
-    time_diff = (now - last_seen).total_seconds()
-
-    if time_diff > absence_threshold_seconds:
-        # Person was absent for long enough – treat as new presence
-        camera_presence_state[camera_id] = now
-        return True
-
-    # Still within active presence window – skip
-    camera_presence_state[camera_id] = now  # Update even if skipping, to reset absence window
-    return False
-
-def record_and_notify_logs(detections, camera_id, frame_id):
-    if not any(det["class"] == "person" for det in detections):
-        # No person, don't update presence
+def record_and_notify_logs(births, camera_id, frame_id):
+    """Log each newly confirmed track once, to the CSV and the dashboard."""
+    if not births:
         return
 
-    if not should_emit_log(camera_id):
-        # Person recently detected, skip redundant log
-        return
-
-    # Proceed to log
     file_exists = os.path.isfile(csv_path)
     with open(csv_path, 'a', newline='') as csvfile:
         writer = csv.writer(csvfile)
         if not file_exists:
             writer.writerow([
-                "date", "time", "camera_id", "frame_id",
+                "date", "time", "camera_id", "frame_id", "track_id",
                 "class", "confidence", "xmin", "ymin", "xmax", "ymax"
             ])
 
@@ -313,37 +588,64 @@ def record_and_notify_logs(detections, camera_id, frame_id):
         date_str = now.strftime("%d-%m-%y")
         time_str = now.strftime("%H:%M:%S")
 
-        for det in detections:
-            if det["class"] != "person":
-                continue  # You only want to control logging for persons
-
-            log_entry = [
+        for track in births:
+            xmin, ymin, xmax, ymax = (int(v) for v in track.box())
+            confidence = round(track.confidence, 2)
+            writer.writerow([
                 date_str, time_str,
-                camera_id, frame_id,
-                det["class"], det["confidence"],
-                det["xmin"], det["ymin"], det["xmax"], det["ymax"]
-            ]
-            writer.writerow(log_entry)
+                camera_id, frame_id, track.track_id,
+                track.class_name, confidence,
+                xmin, ymin, xmax, ymax
+            ])
 
             emit_log_event({
                 "date": date_str,
                 "time": time_str,
                 "camera_id": camera_id,
                 "frame_id": frame_id,
-                "class": det["class"],
-                "confidence": det["confidence"],
+                "track_id": track.track_id,
+                "class": track.class_name,
+                "confidence": confidence,
                 "bbox": {
-                    "xmin": det["xmin"],
-                    "ymin": det["ymin"],
-                    "xmax": det["xmax"],
-                    "ymax": det["ymax"]
+                    "xmin": xmin,
+                    "ymin": ymin,
+                    "xmax": xmax,
+                    "ymax": ymax
                 }
             })
 
 
-def process_human_detection_with_recording(frame, camera_id, frame_id, fps=1, detection_dir='detections'):
-    processor = get_next_processor()  # Round-robin selection
-    detections = processor.process_frame(frame_id, frame, camera_id)
+def detect_for_tracking(frame, camera_id, frame_id, mode):
+    """Detector output for this frame, or None when the tracker should just propagate its tracks."""
+    tracker = trackers[camera_id]
+    cached = last_detections.get(camera_id)
+    cached = cached[1] if cached is not None and cached[0] == mode else None
+    if cached is not None and tracker.frames_since_update + 1 < DETECT_EVERY_N:
+        return None  # Between detector passes
+
+    # Inference (and motion gating) only looks at the camera's ROI: masked crop of its bounding rectangle
+    roi = camera_rois.get(camera_id)
+    inference_frame, offset = roi.crop(frame) if roi is not None else (frame, None)
+
+    gate = motion_gates.get(camera_id)
+    if gate is not None and not gate.should_infer(inference_frame) and cached is not None:
+        return cached  # Static scene: reuse the last result so tracks stay alive
+
+    # Shared model pool or cross-camera batch
+    with timed(camera_id, "detect"):
+        detections = run_detection(frame_id, inference_frame, camera_id, mode=mode,
+                                   tiling=camera_tiling.get(camera_id))
+    if roi is not None:
+        detections = roi.map_back(detections, offset)
+    last_detections[camera_id] = (mode, detections)
+    if gate is not None:
+        gate.mark_inferred()
+    return detections
+
+
+def process_human_detection_with_recording(frame, camera_id, frame_id, fps=1, detection_dir='detections', mode="human"):
+    if not models_ready(mode):
+        return frame  # This mode's detectors are still loading or warming up
 
     # Initialize per-camera state
     if camera_id not in recording_states:
@@ -352,27 +654,25 @@ def process_human_detection_with_recording(frame, camera_id, frame_id, fps=1, de
             "thread": None,
             "stop_event": threading.Event()
         }
-        detection_streaks[camera_id] = 0
-        no_detection_counts[camera_id] = 0
-        recording_buffers[camera_id] = deque(maxlen=30 * fps)  # 30 seconds buffer
+    tracker = trackers.setdefault(camera_id, SortTracker())
 
-    marked_frame = frame.copy()
-    has_detection = detections is not None and len(detections) > 0
+    detections = detect_for_tracking(frame, camera_id, frame_id, mode)
+    with timed(camera_id, "track"):
+        if detections is None:
+            tracks, births, deaths = tracker.propagate(), [], []
+        else:
+            tracks, births, deaths = tracker.update(detections)
 
-    # Update streak counters
-    if has_detection:
-        detection_streaks[camera_id] += 1
-        no_detection_counts[camera_id] = 0
-    else:
-        detection_streaks[camera_id] = 0
-        no_detection_counts[camera_id] += 1
+    marked_frame = frame.copy()
 
-    # Add frame to rolling buffer
-    recording_buffers[camera_id].append(marked_frame)
+    if births:
+        with timed(camera_id, "log"):
+            record_and_notify_logs(births, camera_id, frame_id)
 
-    # Start recording if streak passes threshold
-    if detection_streaks[camera_id] >= 5 and not recording_states[camera_id]["is_recording"]:
-        if camera_id not in recording_buffers or len(recording_buffers[camera_id]) == 0:
+    # Start recording when a new track is confirmed
+    if births and not recording_states[camera_id]["is_recording"]:
+        ring = open_consumer_ring(camera_id)
+        if ring is None:
             logger.warning(f"[Camera-{camera_id}] Buffer not ready. Skipping recording trigger.")
             return marked_frame
 
@@ -382,7 +682,7 @@ def process_human_detection_with_recording(frame, camera_id, frame_id, fps=1, de
         stop_event = threading.Event()
         thread = threading.Thread(
             target=recorder,
-            args=(camera_id, output_path, list(recording_buffers[camera_id]), stop_event, fps),
+            args=(camera_id, output_path, ring, stop_event, fps),
             daemon=True
         )
         thread.start()
@@ -395,14 +695,14 @@ def process_human_detection_with_recording(frame, camera_id, frame_id, fps=1, de
         logger.info(f"[Camera-{camera_id}] Started recording.")
         emit_recording_event(camera_id, "started")
 
-    # Stop recording if inactivity detected
-    if recording_states[camera_id]["is_recording"] and no_detection_counts[camera_id] >= 5:
+    # Stop recording once the last confirmed track has died
+    if deaths and recording_states[camera_id]["is_recording"] and tracker.active_count() == 0:
         def stop_rec_due_to_inactivity():
             try:
                 recording_states[camera_id]["stop_event"].set()
                 recording_states[camera_id]["thread"].join()
                 recording_states[camera_id]["is_recording"] = False
-                logger.info(f"[Camera-{camera_id}] Stopped recording due to inactivity.")
+                logger.info(f"[Camera-{camera_id}] Stopped recording: all tracks ended.")
             except Exception as e:
                 logger.error(f"[Camera-{camera_id}] Error stopping recording: {e}")
 
@@ -410,8 +710,9 @@ def process_human_detection_with_recording(frame, camera_id, frame_id, fps=1, de
 
 
     # Draw bounding boxes
-    if detections:
-        marked_frame = draw_bounding_boxes(marked_frame, detections)
+    if len(tracks):
+        with timed(camera_id, "draw"):
+            marked_frame = draw_bounding_boxes(marked_frame, tracks)
     return marked_frame
 
 def draw_bounding_boxes(frame, detections):
@@ -428,28 +729,51 @@ def draw_bounding_boxes(frame, detections):
 
         # Add label and confidence
         label_text = f"{label} ({score:.2f})"
+        if "track_id" in det.dtype.names:
+            label_text = f"{label} #{det['track_id']} ({score:.2f})"
         cv2.putText(frame, label_text, (x1, max(0, y1 - 10)),
                     cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 255, 0), 2)
     return frame
 
-def recorder(camera_id, output_path, buffer, stop_event, fps=1):
+def recorder(camera_id, output_path, ring, stop_event, fps=1):
+    """Record a camera's processed frame ring (enhanced, with detection boxes): the frames still in it as
+    pre-roll, then every new one until stopped."""
     app, db = get_app_and_socketio()
     logger.info(f"[Recorder-{camera_id}] Starting recording to {output_path}")
 
-    height, width = buffer[0].shape[:2]
-    fourcc = cv2.VideoWriter_fourcc(*'mp4v')
-    writer = cv2.VideoWriter(output_path, fourcc, fps, (width, height))
-
+    writer = None
+    frame_size = None
     start_time = datetime.now()
-
-    for frame in buffer:
-        writer.write(frame)
+    next_seq = max(ring.latest_seq() - ring.slots + 1, 0)
 
     while not stop_event.is_set() or (datetime.now() - start_time).total_seconds() < 30:
-        if camera_id in recording_buffers and len(recording_buffers[camera_id]) > 0:
-            writer.write(recording_buffers[camera_id][-1])
-        time.sleep(1 / fps)
+        if ring.closed:
+            # The producer recreated the ring (reconnect, new resolution or mode); follow the new one
+            ring = open_consumer_ring(camera_id)
+            if ring is None:
+                time.sleep(1 / fps)
+                continue
+            next_seq = max(ring.latest_seq(), 0)
 
+        latest = ring.latest_seq()
+        if next_seq > latest:
+            time.sleep(1 / fps)
+            continue
+        for seq in range(max(next_seq, latest - ring.slots + 1), latest + 1):
+            frame = ring.read(seq)
+            if frame is None:
+                continue
+            if writer is None:
+                frame_size = (frame.shape[1], frame.shape[0])
+                writer = cv2.VideoWriter(output_path, cv2.VideoWriter_fourcc(*'mp4v'), fps, frame_size)
+            if (frame.shape[1], frame.shape[0]) == frame_size:
+                writer.write(frame)
+        next_seq = latest + 1
+
+    close_consumer_ring(ring)
+    if writer is None:
+        logger.warning(f"[Recorder-{camera_id}] No frames received, nothing recorded.")
+        return
     writer.release()
     end_time = datetime.now()
     logger.info(f"[Recorder-{camera_id}] Stopped recording.")
@@ -464,8 +788,11 @@ def recorder(camera_id, output_path, buffer, stop_event, fps=1):
 
 def stop_all_processing():
     """Stop processing for all currently active cameras."""
-    camera_ids = list(camera_threads.keys())  # Get all active camera IDs
     logger.info("🛑 Stopping processing for all cameras...")
+    if camera_worker_pool.active:
+        camera_worker_pool.stop_all()
+        return
+    camera_ids = list(camera_threads.keys())  # Get all active camera IDs
 
     for cam_id in camera_ids:
         try:
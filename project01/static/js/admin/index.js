@@ -135,8 +135,9 @@ document.getElementById("model-select").addEventListener("change", function () {
   fetch(`/admin/changeAiModel/${selectedModel}`, {
     method: "GET",
   })
-    .then((response) => response.json())
-    .then((data) => {
+    .then((response) => response.json().then((data) => ({ ok: response.ok, data })))
+    .then(({ ok, data }) => {
+      if (!ok) throw new Error(data.error);
       showToast("success", `Mode Changed Sucessfully.`);
     })
     .catch((error) => {
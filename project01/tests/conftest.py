@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The app imports its packages relative to project01 (run from there), so tests do the same
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,98 @@
+"""FastImagePreprocessor against the HF image processors it replaces.
+
+Processors are built from the preprocessor configs shipped in modelRepository
+(RT-DETR ships none and uses the class defaults, which match its checkpoint),
+so no weights are needed. Every output must be within one uint8 level of the
+HF output after normalisation, and DETR's padding and pixel_mask must match.
+"""
+import json
+import os
+
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from service.preprocessing_service import FastImagePreprocessor  # noqa: E402
+
+MODEL_REPOSITORY = os.path.join(os.path.dirname(__file__), "..", "..", "modelRepository")
+FAMILIES = {
+    "detr": ("DetrImageProcessor", "detr-resn/default"),
+    "bit": ("BitImageProcessor", "dino-animal-classifer/default"),
+    "dpt": ("DPTImageProcessor", "depth-model/default"),
+    "rtdetr": ("RTDetrImageProcessor", None)
+}
+
+
+def synthetic_frames():
+    """Smooth test frames at common camera sizes (noise exaggerates interpolation differences)."""
+    frames = []
+    for height, width in ((720, 1280), (1080, 1920), (480, 640), (600, 450)):
+        y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+        frame = np.stack([
+            127 + 127 * np.sin(x / 37.0),
+            127 + 127 * np.cos(y / 23.0),
+            255 * (x + y) / (height + width)
+        ], axis=-1)
+        frames.append(frame.astype(np.uint8))
+    return frames
+
+
+FRAMES = synthetic_frames()
+
+
+def hf_processor(family):
+    name, model_dir = FAMILIES[family]
+    # The PIL-based processor is the reference; transformers >= 5 names it `<name>Pil`
+    cls = getattr(transformers, f"{name}Pil", None) or getattr(transformers, name)
+    if model_dir is None:
+        return cls()
+    path = os.path.join(MODEL_REPOSITORY, model_dir, "preprocessor_config.json")
+    if not os.path.exists(path):
+        pytest.skip(f"{path} not found")
+    with open(path, "r") as f:
+        config = json.load(f)
+    config.pop("image_processor_type", None)
+    return cls(**config)
+
+
+def one_level(processor):
+    """Size of one uint8 step after rescaling and normalisation: the resize rounding allowance."""
+    step = processor.rescale_factor
+    if processor.do_normalize:
+        step /= min(processor.image_std)
+    return step + 1e-5
+
+
+def reference(processor, frames):
+    return processor(images=[cv2.cvtColor(frame, cv2.COLOR_BGR2RGB) for frame in frames], return_tensors="np")
+
+
+@pytest.mark.parametrize("family", list(FAMILIES))
+@pytest.mark.parametrize("frame", FRAMES, ids=[f"{f.shape[0]}x{f.shape[1]}" for f in FRAMES])
+def test_matches_hf_processor(family, frame):
+    processor = hf_processor(family)
+    expected = reference(processor, [frame])
+    actual = FastImagePreprocessor(processor)([frame])
+
+    pixel_values = actual["pixel_values"].numpy()
+    assert pixel_values.shape == expected["pixel_values"].shape
+    assert np.abs(pixel_values - expected["pixel_values"]).max() <= one_level(processor)
+    if "pixel_mask" in expected:
+        np.testing.assert_array_equal(actual["pixel_mask"].numpy(), expected["pixel_mask"])
+    else:
+        assert "pixel_mask" not in actual
+
+
+def test_detr_batch_padding_matches_hf_processor():
+    processor = hf_processor("detr")
+    frames = FRAMES[2:]  # landscape and portrait, so both dimensions are padded
+    expected = reference(processor, frames)
+    actual = FastImagePreprocessor(processor)(frames)
+
+    pixel_values = actual["pixel_values"].numpy()
+    assert pixel_values.shape == expected["pixel_values"].shape
+    assert np.abs(pixel_values - expected["pixel_values"]).max() <= one_level(processor)
+    np.testing.assert_array_equal(actual["pixel_mask"].numpy(), expected["pixel_mask"])